@@ -1,172 +1,378 @@
+import os
+import re
+import sys
+import time
+import threading
+from io import BytesIO
 import streamlit as st
 import pandas as pd
-from unsupervised.clustering import perform_clustering_and_visualize  
-from supervised.profit_loss import process_image as process_profit_loss  
-from supervised.payslip import process_payslip  
-from supervised.invoice import process_invoice  
-from supervised.bank_statements import process_bank_statement, plot_category_spending
-from semi_supervised.api_visualization import plot_payment_mode_distribution  
-import os
+import pipelines  # Pipelines are imported lazily, when their document type is first used
+
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "32"))
+RESULT_CACHE_TTL = int(os.getenv("RESULT_CACHE_TTL", "3600"))  # Seconds
+JOB_POLL_SECONDS = 1.0
+PREVIEW_ROWS = 1000  # Rows of an uploaded clustering CSV shown (and validated) in the page
 
 st.title("Financial Transaction Analysis")
 
+# Optional background preload of other pipelines (PRELOAD_PIPELINES), once per server process
+@st.cache_resource
+def start_preload():
+    return pipelines.preload_from_env()
+
+start_preload()
+
+# Background job queue shared by every session of this server (jobs run off the script thread)
+@st.cache_resource
+def job_queue():
+    import jobs
+    return jobs.get_queue()
+
+# Hit/miss counters shared by every session of this server
+@st.cache_resource
+def result_cache_counters():
+    return {"calls": 0, "misses": 0, "lock": threading.Lock()}
+
+# Runs only on a cache miss: loads a finished job's result from the job table
+@st.cache_data(max_entries=RESULT_CACHE_MAX_ENTRIES, ttl=RESULT_CACHE_TTL, show_spinner=False)
+def job_result_cached(job_id):
+    counters = result_cache_counters()
+    with counters["lock"]:
+        counters["misses"] += 1
+    return job_queue().result(job_id)
+
+# Jobs for this document type as [(file name, job id)]: new uploads submit one job per file
+# (the same document reuses its job, failed or not, keyed by content hash and code version);
+# after a browser refresh the job ids come back from the URL
+def current_jobs(doc_type, uploaded_files):
+    params = st.experimental_get_query_params()
+    if uploaded_files:
+        submitted = [(f.name, job_queue().submit(doc_type, f.getvalue(), name=f.name)) for f in uploaded_files]
+        job_ids = [job_id for _, job_id in submitted]
+        if params.get("job", []) != job_ids:
+            st.experimental_set_query_params(job=job_ids)
+        return submitted
+    restored = []
+    for job_id in params.get("job", []):
+        status = job_queue().status(job_id)
+        if status and status["doc_type"] == doc_type:
+            restored.append((status["name"] or job_id[:8], job_id))
+    return restored
+
+# Result of a finished job (through the bounded result cache)
+def job_result(job_id):
+    counters = result_cache_counters()
+    with counters["lock"]:
+        counters["calls"] += 1
+    return job_result_cached(job_id)
+
+# Month ("2024-03") or vendor/name label for a document, taken from its file name
+MONTHS = ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"]
+def document_label(file_name):
+    stem = os.path.splitext(os.path.basename(file_name))[0]
+    numeric = re.search(r"(20\d\d)[-_ .]?(0[1-9]|1[0-2])(?!\d)", stem)
+    if numeric:
+        return f"{numeric.group(1)}-{numeric.group(2)}"
+    named = re.search(r"(?i)(" + "|".join(MONTHS) + r")[a-z]*[-_ .]?(20\d\d)?", stem)
+    if named:
+        month = MONTHS.index(named.group(1).lower()) + 1
+        return f"{named.group(2)}-{month:02d}" if named.group(2) else named.group(1).capitalize()
+    return stem
+
+def result_cache_stats():
+    counters = result_cache_counters()
+    with counters["lock"]:
+        calls, misses = counters["calls"], counters["misses"]
+    return {"lookups": calls, "hits": calls - misses, "misses": misses,
+            "hit_rate": round((calls - misses) / calls, 3) if calls else 0.0,
+            "max_entries": RESULT_CACHE_MAX_ENTRIES, "ttl_seconds": RESULT_CACHE_TTL}
+
+# Sidebar: result cache (filled in after this run's processing so it includes it)
+result_cache_sidebar = st.sidebar.empty()
+
+# Sidebar stats only for modules a pipeline has already imported (reading them must not import them)
+# Shared OCR worker pool health (queue depth and per-job latency)
+if "supervised.ocr_engine" in sys.modules:
+    ocr_stats = sys.modules["supervised.ocr_engine"].stats()
+    if ocr_stats:
+        st.sidebar.subheader("OCR Engine")
+        st.sidebar.write(ocr_stats)
+if "supervised.ocr_cache" in sys.modules:
+    cache_stats = sys.modules["supervised.ocr_cache"].stats()
+    if cache_stats:
+        st.sidebar.subheader("OCR Cache")
+        st.sidebar.write(cache_stats)
+if "supervised.adaptive_ocr" in sys.modules:
+    escalation_stats = sys.modules["supervised.adaptive_ocr"].stats()
+    if escalation_stats:
+        st.sidebar.subheader("OCR Escalations (final step per document)")
+        st.sidebar.write(escalation_stats)
+if "supervised.statement_template" in sys.modules:
+    template_stats = sys.modules["supervised.statement_template"].stats()
+    if template_stats["pages_template"] or template_stats["pages_fallback"]:
+        st.sidebar.subheader("Bank Statement Layout Templates")
+        st.sidebar.write(template_stats)
+
+# Render one processed document
+def show_unsupervised(result, upload_df=None):
+    summary, sample_df, bar_fig, pie_fig = result
+    if upload_df is not None:
+        # Show the first rows of the original DataFrame
+        st.subheader("Original Data")
+        st.write(upload_df)
+
+    # The upload is clustered chunk by chunk; the run summary has the row and per-cluster counts
+    st.subheader("Clustering Summary")
+    st.write(summary)
+
+    # Display the first clustered rows
+    st.subheader(f"Clustered Data (first {len(sample_df)} of {summary['rows']} rows)")
+    st.write(sample_df[['Transaction ID', 'Description', 'Amount', 'Cluster_KMeans_Mapped']])
+
+    # Display the bar chart
+    st.subheader("Transaction Count per Cluster (Bar Chart)")
+    st.pyplot(bar_fig)
+
+    # Display the pie chart
+    st.subheader("Cluster Distribution in Transactions (Pie Chart)")
+    st.pyplot(pie_fig)
+
+    # Provide download link for the clustered CSV (kept on disk with its job)
+    st.subheader("Download the Clustered Data")
+    if not os.path.exists(summary.get("output_path", "")):
+        st.caption("The clustered CSV is no longer available; upload the file again.")
+        return
+    with open(summary["output_path"], "rb") as f:
+        st.download_button(
+            label="Download Clustered CSV",
+            data=f,
+            file_name="clustered_transactions.csv",
+            mime="text/csv",
+            key=f"download-{id(result)}")
+
+def show_payslip(result):
+    earnings, bar_chart, pie_chart, duplicate_of = result
+    if duplicate_of:
+        st.info(f"Near-duplicate of payslip #{duplicate_of['document_id']} "
+                f"(hash distance {duplicate_of['distance']}); showing its earlier extraction.")
+
+    # Display extracted earnings data as a table
+    st.subheader("Extracted Data From Payslip:")
+    st.dataframe(earnings)
+
+    # Display the Bar Chart
+    st.subheader("Earnings Distribution (Bar Chart):")
+    st.image(bar_chart, caption="Bar Chart")
+
+    # Display the Pie Chart
+    st.subheader("Earnings Distribution (Pie Chart):")
+    st.image(pie_chart, caption="Pie Chart")
+
+def show_profit_loss(result):
+    data, pie_chart, bar_chart = result
+
+    # Display extracted data (as a table)
+    st.subheader("Extracted Data From Profit & Loss:")
+    st.dataframe(data)
+
+    # Display the Pie Chart
+    st.subheader("Business Expenses (Pie Chart):")
+    st.image(pie_chart, caption="Pie Chart")
+
+    # Display the Bar Chart
+    st.subheader("Business Expenses (Bar Chart):")
+    st.image(bar_chart, caption="Bar Chart")
+
+def show_invoice(result):
+    df, bar_chart, line_chart, pie_chart, duplicate_of = result
+    if duplicate_of:
+        st.info(f"Near-duplicate of invoice #{duplicate_of['document_id']} "
+                f"(hash distance {duplicate_of['distance']}); showing its earlier extraction.")
+
+    # Display extracted data (as a table)
+    st.subheader("Extracted Data From Invoice:")
+    st.dataframe(df)
+
+    # Display the Bar Chart
+    if bar_chart:
+        st.subheader("Invoice Totals (Bar Chart):")
+        st.pyplot(bar_chart)
+    else:
+        st.write("No valid bar chart data.")
+
+    # Display the Line Chart
+    if line_chart:
+        st.subheader("Invoice Totals (Line Chart):")
+        st.pyplot(line_chart)
+    else:
+        st.write("No valid line chart data.")
+
+    # Display the Pie Chart
+    if pie_chart:
+        st.subheader("Invoice Totals (Pie Chart):")
+        st.pyplot(pie_chart)
+    else:
+        st.write("No valid pie chart data.")
+
+def show_bank_statement(result):
+    # Only transactions not already stored for this account were ingested
+    df, counts = result
+    st.info(f"{counts['rows_new']} new transactions ingested; {counts['rows_skipped']} already ingested "
+            f"were skipped ({counts['pages_skipped']} of {counts['pages']} pages skipped, "
+            f"{counts.get('pages_extracted', counts['pages'])} extracted).")
+    continuity = counts.get("continuity")
+    if continuity and not continuity["ok"]:
+        st.warning(f"The balance on {continuity['post_date']} is {continuity['found']}, but the previous "
+                   f"statement ended at a balance giving {continuity['expected']}: a statement in between "
+                   "may be missing.")
+
+    if df.empty:
+        st.write("No new transactions in this statement.")
+    else:
+        # Display basic data
+        st.subheader("Extracted the Transaction data of First 5 Records:")
+        st.dataframe(df.head())
+
+    # Visualize the spending distribution by category over everything stored for this account
+    from supervised.bank_statements import plot_category_spending
+    from supervised.statement_ingest import account_history
+    history = account_history(counts["account"], columns=["Post Date", "Description", "DR", "CR", "Category"])
+    if not history.empty:
+        st.subheader("Spending Distribution In The Form of Pie Chart, Bar Graph, Scatter Plot")
+        st.caption(f"All {len(history)} transactions stored for account {counts['account']}")
+        plot_category_spending(history)
+
+# Aggregated views over several processed documents ({file name: result})
+def aggregate_payslips(results):
+    earnings = pd.DataFrame([result[0] for result in results.values()],
+                            index=[document_label(name) for name in results]).fillna(0)
+    earnings = earnings.groupby(level=0).sum().sort_index()  # Two payslips for one month add up
+    st.subheader("Earnings Across Months")
+    st.dataframe(earnings.assign(Total=earnings.sum(axis=1)))
+    st.bar_chart(earnings)
+    st.line_chart(earnings.sum(axis=1).rename("Total Earnings"))
+
+def aggregate_invoices(results):
+    totals = pd.Series({document_label(name): pd.to_numeric(result[0]["Total"], errors="coerce").sum()
+                        for name, result in results.items()}, name="Invoice Total")
+    totals = totals.groupby(level=0).sum().sort_values(ascending=False)  # Several invoices per vendor add up
+    st.subheader("Invoice Totals Across Vendors")
+    st.dataframe(totals)
+    st.bar_chart(totals)
+
+def aggregate_profit_loss(results):
+    expenses = pd.concat([result[0].assign(Document=document_label(name)) for name, result in results.items()])
+    expenses["Amount"] = pd.to_numeric(expenses["Amount"], errors="coerce")
+    table = expenses.pivot_table(index="Document", columns="Allowable Business Expenses",
+                                 values="Amount", aggfunc="sum", fill_value=0)
+    st.subheader("Business Expenses Across Documents")
+    st.dataframe(table.assign(Total=table.sum(axis=1)))
+    st.bar_chart(table)
+
+def aggregate_bank_statements(results):
+    summary = pd.DataFrame([{"Statement": name, "Account": result[1]["account"], "New": result[1]["rows_new"],
+                             "Skipped": result[1]["rows_skipped"]} for name, result in results.items()])
+    st.subheader("Statements Ingested")
+    st.dataframe(summary)
+
+RENDERERS = {
+    "Payslip": (show_payslip, aggregate_payslips),
+    "Profit & Loss": (show_profit_loss, aggregate_profit_loss),
+    "Invoice": (show_invoice, aggregate_invoices),
+    "Bank Statement": (show_bank_statement, aggregate_bank_statements),
+    "Unsupervised Data": (show_unsupervised, None),
+}
+
 # Step 1: Dropdown to select the document type
 doc_type = st.selectbox("Select the document type:", ["Payslip", "Profit & Loss", "Invoice", "Bank Statement", "Semi-supervised API", "Unsupervised Data"])
 
-# Step 2: File upload conditionally based on document type
+# Step 2: File upload conditionally based on document type (several files at once)
 if doc_type == "Unsupervised Data":
-    uploaded_file = st.file_uploader("Choose a CSV file for clustering", type="csv", key="file_uploader")
+    uploaded_files = st.file_uploader("Choose CSV files for clustering", type="csv", key="file_uploader", accept_multiple_files=True)
 elif doc_type == "Payslip":
-    uploaded_file = st.file_uploader("Choose an image or PDF for Payslip", type=["jpg", "jpeg", "png", "pdf"], key="file_uploader")
+    uploaded_files = st.file_uploader("Choose images or PDFs for Payslip", type=["jpg", "jpeg", "png", "pdf"], key="file_uploader", accept_multiple_files=True)
 elif doc_type == "Profit & Loss":
-    uploaded_file = st.file_uploader("Choose an image or PDF for Profit & Loss", type=["jpg", "jpeg", "png", "pdf"], key="file_uploader")
+    uploaded_files = st.file_uploader("Choose images or PDFs for Profit & Loss", type=["jpg", "jpeg", "png", "pdf"], key="file_uploader", accept_multiple_files=True)
 elif doc_type == "Invoice":
-    uploaded_file = st.file_uploader("Choose an image or PDF for Invoice", type=["jpg", "jpeg", "png", "pdf"], key="file_uploader")
+    uploaded_files = st.file_uploader("Choose images or PDFs for Invoice", type=["jpg", "jpeg", "png", "pdf"], key="file_uploader", accept_multiple_files=True)
 elif doc_type == "Bank Statement":
-    uploaded_file = st.file_uploader("Choose an image or PDF for Bank Statement", type=["pdf"], key="file_uploader")
+    uploaded_files = st.file_uploader("Choose PDFs for Bank Statement", type=["pdf"], key="file_uploader", accept_multiple_files=True)
 elif doc_type == "Semi-supervised API":
-    uploaded_file = None  # No file upload for this type, as we use an API
+    uploaded_files = []  # No file upload for this type, as we use an API
 
-# Step 3: Checking if a file is uploaded based on the selected doc_type
-if uploaded_file is None and doc_type != "Semi-supervised API":
-    st.warning(f"Please upload a {doc_type} document to proceed.")
-else:
-    # Proceeding with processing after file upload
-    if doc_type == "Unsupervised Data":
-        if uploaded_file is not None:
-            # Handle CSV file upload for clustering
-            df = pd.read_csv(uploaded_file)
-
-            if df.empty:
-                st.error("The uploaded CSV is empty. Please upload a valid file.")
-            elif 'Amount' in df.columns and 'Description' in df.columns:
-                # Show the original DataFrame
-                st.subheader("Original Data")
-                st.write(df)
-
-                # Perform clustering and get results
-                clustered_df, bar_fig, pie_fig = perform_clustering_and_visualize(df)
-
-                # Display the clustered DataFrame
-                st.subheader("Clustered Data")
-                st.write(clustered_df[['Transaction ID', 'Description', 'Amount', 'Cluster_KMeans_Mapped']])
-
-                # Display the bar chart
-                st.subheader("Transaction Count per Cluster (Bar Chart)")
-                st.pyplot(bar_fig)
-
-                # Display the pie chart
-                st.subheader("Cluster Distribution in Transactions (Pie Chart)")
-                st.pyplot(pie_fig)
-                
-                # Provide download link for the clustered CSV
-                st.subheader("Download the Clustered Data")
-                st.download_button(
-                    label="Download Clustered CSV",
-                    data=clustered_df.to_csv(index=False).encode('utf-8'),
-                    file_name="clustered_transactions.csv",
-                    mime="text/csv")
-            
-            else:
-                st.error("The uploaded file must contain 'Amount' and 'Description' columns.")
-    elif doc_type == "Payslip":
-        # Process the payslip image
-        image_path = "temp_image.jpg"
-        with open(image_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
-        earnings, bar_chart, pie_chart = process_payslip(image_path)
-
-        # Display extracted earnings data as a table
-        st.subheader("Extracted Data From Payslip:")
-        st.dataframe(earnings)
-
-        # Display the Bar Chart
-        st.subheader("Earnings Distribution (Bar Chart):")
-        st.image(bar_chart, caption="Bar Chart")
-
-        # Display the Pie Chart
-        st.subheader("Earnings Distribution (Pie Chart):")
-        st.image(pie_chart, caption="Pie Chart")
-    
-    elif doc_type == "Profit & Loss":
-        # Process the Profit & Loss image
-        data, pie_chart, bar_chart = process_profit_loss(uploaded_file)
-
-        # Display extracted data (as a table)
-        st.subheader("Extracted Data From Profit & Loss:")
-        st.dataframe(data)
-
-        # Display the Pie Chart
-        st.subheader("Business Expenses (Pie Chart):")
-        st.image(pie_chart, caption="Pie Chart")
-
-        # Display the Bar Chart
-        st.subheader("Business Expenses (Bar Chart):")
-        st.image(bar_chart, caption="Bar Chart")
-
-    elif doc_type == "Invoice":
-        if uploaded_file is not None:
-            # Process the uploaded invoice image
-            image_path = "temp_invoice_image.jpg"
-            with open(image_path, "wb") as f:
-                f.write(uploaded_file.getbuffer())
-
-            # Process the invoice and get results
-            df, bar_chart, line_chart, pie_chart = process_invoice(image_path)
-
-            # Display extracted data (as a table)
-            st.subheader("Extracted Data From Invoice:")
-            st.dataframe(df)
-
-            # Display the Bar Chart
-            if bar_chart:
-                st.subheader("Invoice Totals (Bar Chart):")
-                st.pyplot(bar_chart)
-            else:
-                st.write("No valid bar chart data.")
+# Check the clustering CSVs before queueing them (only the first rows are read here; the job reads the rest)
+upload_frames = {}
+if doc_type == "Unsupervised Data":
+    for uploaded_file in uploaded_files:
+        upload_df = pd.read_csv(BytesIO(uploaded_file.getvalue()), nrows=PREVIEW_ROWS)
+        if upload_df.empty:
+            st.error(f"{uploaded_file.name}: the uploaded CSV is empty. Please upload a valid file.")
+            st.stop()
+        if 'Amount' not in upload_df.columns or 'Description' not in upload_df.columns:
+            st.error(f"{uploaded_file.name}: the uploaded file must contain 'Amount' and 'Description' columns.")
+            st.stop()
+        upload_frames[uploaded_file.name] = upload_df
 
-            # Display the Line Chart
-            if line_chart:
-                st.subheader("Invoice Totals (Line Chart):")
-                st.pyplot(line_chart)
-            else:
-                st.write("No valid line chart data.")
+# Step 3: Submit each upload as a background job (or pick the jobs up again after a refresh)
+submitted = current_jobs(doc_type, uploaded_files) if doc_type != "Semi-supervised API" else []
 
-            # Display the Pie Chart
-            if pie_chart:
-                st.subheader("Invoice Totals (Pie Chart):")
-                st.pyplot(pie_chart)
+if not submitted and doc_type != "Semi-supervised API":
+    st.warning(f"Please upload a {doc_type} document to proceed.")
+elif doc_type == "Semi-supervised API":
+    st.subheader("Visualizing API Data (Pie Chart)")
+    # Call function to generate the API visualization
+    img_base64 = pipelines.get(doc_type)()
+    st.image(f"data:image/png;base64,{img_base64}")
+else:
+    # Results appear as each document's job completes; unfinished ones show their progress
+    show, aggregate = RENDERERS[doc_type]
+    finished, pending = {}, 0
+    if len(submitted) > 1:
+        summary = st.container()  # Filled once the per-document results below are known
+    for name, job_id in submitted:
+        status = job_queue().status(job_id)
+        with st.expander(name, expanded=len(submitted) == 1):
+            if status["status"] == "done":
+                result = job_result(job_id)
+                finished[name] = result
+                if doc_type == "Unsupervised Data":
+                    show(result, upload_frames.get(name))
+                else:
+                    show(result)
+            elif status["status"] == "failed":
+                # Failed jobs are reused like finished ones; only this button runs the document again
+                st.error(f"Processing failed: {status['error']}")
+                upload = next((f for f in uploaded_files if f.name == name), None)
+                if upload is None:
+                    st.caption("Upload the document again to retry it.")
+                elif st.button("Retry", key=f"retry-{job_id}"):
+                    job_queue().submit(doc_type, upload.getvalue(), name=upload.name, retry=True)
+                    st.experimental_rerun()
             else:
-                st.write("No valid pie chart data.")
-            
-            # Clean up the temporary file
-            if os.path.exists(image_path):
-                os.remove(image_path)
-        else:
-            st.warning("Please upload an invoice document to proceed.")
-
-    elif doc_type == "Bank Statement":
-        # Handle bank statement PDF files
-        temp_pdf_path = "temp_uploaded_pdf.pdf"
-        with open(temp_pdf_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
-        # Process the uploaded PDF
-        df = process_bank_statement(temp_pdf_path)
+                pending += 1
+                done, total = status["pages_done"], status["pages_total"]
+                pages = f": page {done} of {total}" if total else ""
+                st.info(f"Job {job_id[:8]} is {status['status']}{pages}. "
+                        "It keeps running if you refresh or leave this page.")
+                st.progress(done / total if total else 0.0)
 
-        # Display basic data
-        st.subheader("Extracted the Transaction data of First 5 Records:")
-        st.dataframe(df.head())  
-
-        # Visualize the spending distribution by category
-        st.subheader("Spending Distribution In The Form of Pie Chart, Bar Graph, Scatter Plot")
-        plot_category_spending(df)
+    if len(submitted) > 1:
+        with summary:
+            st.write(f"{len(finished)} of {len(submitted)} documents processed.")
+            if aggregate is not None and len(finished) > 1:
+                aggregate(finished)
 
-        # Clean up the temporary file
-        if os.path.exists(temp_pdf_path):
-            os.remove(temp_pdf_path)
+# Sidebar: result cache hits (reruns on an unchanged upload skip processing)
+with result_cache_sidebar.container():
+    st.subheader("Result Cache")
+    st.write(result_cache_stats())
+    st.subheader("Background Jobs")
+    st.write(job_queue().stats())
+    if pipelines.stats():
+        st.subheader("Pipeline Import Time (s)")
+        st.write(pipelines.stats())
 
-    elif doc_type == "Semi-supervised API":
-        st.subheader("Visualizing API Data (Pie Chart)")
-        # Call function to generate the API visualization
-        img_base64 = plot_payment_mode_distribution()
-        st.image(f"data:image/png;base64,{img_base64}")
+# Poll again while any job is still queued or running
+if doc_type != "Semi-supervised API" and submitted and pending:
+    time.sleep(JOB_POLL_SECONDS)
+    st.experimental_rerun()
@@ -0,0 +1,140 @@
+"""
+Bulk Document Ingestion (headless)
+
+- Takes a directory or glob pattern and a document type.
+- Spreads the files across a process pool sized to the available cores.
+- Streams one JSON line per document to a single output file as soon as it finishes.
+- Keeps going when a file fails and records the error in the output.
+- Payslips and invoices that are near-duplicates (rescans) of earlier ones reuse
+  the earlier result and are flagged with "near_duplicate_of".
+- Prints throughput in docs/sec at the end.
+
+Usage:
+    python batch_ingest.py payslip "scans/2024-03/*.jpg" -o payslips.jsonl
+    python batch_ingest.py bank_statement statements/ -o statements.jsonl --workers 4
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+DOC_TYPES = ["payslip", "invoice", "profit_loss", "bank_statement"]
+EXTENSIONS = {
+    "payslip": (".jpg", ".jpeg", ".png", ".webp", ".pdf"),
+    "invoice": (".jpg", ".jpeg", ".png", ".webp", ".pdf"),
+    "profit_loss": (".jpg", ".jpeg", ".png", ".webp", ".pdf"),
+    "bank_statement": (".pdf",),
+}
+
+# Resolve a directory or glob pattern into a sorted list of files for this doc type
+def collect_files(source, doc_type):
+    if os.path.isdir(source):
+        paths = [os.path.join(source, name) for name in os.listdir(source)]
+    else:
+        paths = glob.glob(source, recursive=True)
+    return sorted(p for p in paths if os.path.isfile(p) and p.lower().endswith(EXTENSIONS[doc_type]))
+
+# Each batch worker is already one process per core, so keep its OCR pool to one process
+def _init_worker():
+    from supervised import ocr_engine
+    ocr_engine.configure(1)
+
+# Extractors return (result, near-duplicate info or None)
+def _extract_payslip(path):
+    from supervised.payslip import extract_earnings_deduplicated
+    return extract_earnings_deduplicated(path)
+
+def _extract_invoice(path):
+    from supervised.invoice import extract_invoice_deduplicated
+    df, duplicate_of = extract_invoice_deduplicated(path)
+    return df.to_dict(orient="records"), duplicate_of
+
+def _extract_profit_loss(path):
+    from supervised.profit_loss import perform_ocr, extract_expenses
+    with open(path, "rb") as f:
+        ocr_result = perform_ocr(f.read())
+    return extract_expenses(ocr_result).to_dict(orient="records"), None
+
+def _extract_bank_statement(path):
+    from supervised.bank_statements import stream_bank_statement
+    records = []
+    # No CSV sink (results go to the JSON lines output); files are already spread over the workers
+    for batch in stream_bank_statement(path, workers=1):
+        records.extend(json.loads(batch.to_json(orient="records", date_format="iso")))
+    return records, None
+
+EXTRACTORS = {
+    "payslip": _extract_payslip,
+    "invoice": _extract_invoice,
+    "profit_loss": _extract_profit_loss,
+    "bank_statement": _extract_bank_statement,
+}
+
+# Run one document inside a worker; failures become records instead of exceptions
+def process_file(path, doc_type):
+    start = time.perf_counter()
+    record = {"file": path, "doc_type": doc_type}
+    try:
+        record["result"], duplicate_of = EXTRACTORS[doc_type](path)
+        if duplicate_of:
+            record["near_duplicate_of"] = duplicate_of
+        record["status"] = "ok"
+    except Exception as e:
+        record["status"] = "error"
+        record["error"] = f"{type(e).__name__}: {e}"
+        record["traceback"] = traceback.format_exc()
+    record["seconds"] = round(time.perf_counter() - start, 3)
+    return record
+
+# Process every file on a pool and stream results to output_path as JSON lines
+def run_batch(paths, doc_type, output_path, workers=None):
+    workers = workers or os.cpu_count() or 1
+    ok = failed = 0
+    start = time.perf_counter()
+    with open(output_path, "w", encoding="utf-8") as out, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        futures = {pool.submit(process_file, path, doc_type): path for path in paths}
+        for future in as_completed(futures):
+            try:
+                record = future.result()
+            except Exception as e:  # Worker process died (e.g. killed, out of memory)
+                record = {"file": futures[future], "doc_type": doc_type,
+                          "status": "error", "error": f"{type(e).__name__}: {e}"}
+            out.write(json.dumps(record, default=str) + "\n")
+            out.flush()
+            if record["status"] == "ok":
+                ok += 1
+            else:
+                failed += 1
+                print(f"Failed: {record['file']} ({record['error']})", file=sys.stderr)
+    elapsed = time.perf_counter() - start
+    return ok, failed, elapsed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract data from a batch of documents.")
+    parser.add_argument("doc_type", choices=DOC_TYPES, help="Type of the documents")
+    parser.add_argument("source", help="Directory or glob pattern of input files")
+    parser.add_argument("-o", "--output", default="batch_results.jsonl", help="JSON lines output file")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="Worker processes (default: number of CPU cores)")
+    args = parser.parse_args(argv)
+
+    paths = collect_files(args.source, args.doc_type)
+    if not paths:
+        print(f"No {args.doc_type} files found for {args.source}")
+        return 1
+
+    print(f"Processing {len(paths)} {args.doc_type} files ...")
+    ok, failed, elapsed = run_batch(paths, args.doc_type, args.output, args.workers)
+    total = ok + failed
+    print(f"Done: {ok} ok, {failed} failed in {elapsed:.1f}s "
+          f"({total / elapsed if elapsed else 0:.2f} docs/sec). Results: {args.output}")
+    return 0 if failed == 0 else 2
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+"""
+Bank Statement Table Extraction Benchmark: serial vs. process-parallel
+
+- Builds a long statement by repeating the pages of data/bank_statement.pdf
+  (pypdfium2), written to a temporary file.
+- Extracts it with 1 worker (serial, one pdfplumber pass) and with each
+  requested worker count (page ranges in parallel processes).
+- Reports seconds, pages/sec and speedup, and checks every run returns
+  the same rows as the serial run.
+- --bytes passes the statement as in-memory bytes, like an upload, instead
+  of its path.
+
+Usage (from the repository root):
+    python benchmarks/bench_bank_tables.py --pages 300 --workers 2 4 8
+    python benchmarks/bench_bank_tables.py --pages 300 --workers 4 --bytes
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import pypdfium2 as pdfium
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from supervised.bank_statements import extract_data_from_pdf  # noqa: E402
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+SAMPLE = os.path.join(DATA_DIR, "bank_statement.pdf")
+
+# Write a copy of the sample statement repeated up to at least `pages` pages
+def build_statement(path, pages):
+    src = pdfium.PdfDocument(SAMPLE)
+    out = pdfium.PdfDocument.new()
+    while len(out) < pages:
+        out.import_pages(src)
+    out.save(path)
+    return len(out)
+
+def timed(path, workers, as_bytes=False):
+    start = time.perf_counter()
+    if as_bytes:
+        with open(path, "rb") as f:
+            path = f.read()
+    df = extract_data_from_pdf(path, workers=workers)
+    return time.perf_counter() - start, df
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=300, help="Approximate statement length (default 300)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4, os.cpu_count() or 1])
+    parser.add_argument("--bytes", action="store_true", help="Pass the PDF as bytes (an upload), not a path")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "statement.pdf")
+        pages = build_statement(path, args.pages)
+        print(f"{pages} pages, {os.path.getsize(path) / 1e6:.1f} MB, passed as {'bytes' if args.bytes else 'a path'}")
+
+        serial_secs, expected = timed(path, 1, args.bytes)
+        print(f"{'workers':>8} {'seconds':>9} {'pages/s':>9} {'speedup':>8}  rows")
+        print(f"{1:>8} {serial_secs:>9.2f} {pages / serial_secs:>9.1f} {1.0:>8.2f}  {len(expected)}")
+        for workers in sorted(set(args.workers) - {1}):
+            secs, df = timed(path, workers, args.bytes)
+            same = "" if df.equals(expected) else "  (rows differ from serial!)"
+            print(f"{workers:>8} {secs:>9.2f} {pages / secs:>9.1f} {serial_secs / secs:>8.2f}  {len(df)}{same}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Cluster Assignment Benchmark: refit per upload vs. the saved model
+
+- Fits a cluster model once on sampled transaction amounts (the Amount column
+  of data/unsupervised_data.csv with lognormal noise, rounded to cents).
+- Times labelling new amounts three ways:
+  - refit: KMeans fitted on the new amounts (what every upload used to do)
+  - KMeans.predict on standardized amounts with an already fitted KMeans
+  - ClusterModel.assign: np.searchsorted against the saved thresholds
+- Reports rows/sec for each batch size.
+
+Usage (from the repository root):
+    python benchmarks/bench_cluster_assign.py --rows 10000000 --batches 100 10000 1000000
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import numpy as np
+import pandas as pd
+from sklearn.cluster import KMeans
+from sklearn.preprocessing import StandardScaler
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from unsupervised import cluster_model  # noqa: E402
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+
+def sample_amounts(rows, seed):
+    base = pd.read_csv(os.path.join(DATA_DIR, "unsupervised_data.csv"))["Amount"].to_numpy(dtype=float)
+    rng = np.random.default_rng(seed)
+    return np.round(rng.choice(base, rows) * rng.lognormal(0, 0.5, rows), 2)
+
+def rate(rows, secs):
+    return f"{rows / secs:>14,.0f}"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000_000, help="Amounts the model is fitted on")
+    parser.add_argument("--batches", type=int, nargs="+", default=[100, 10_000, 1_000_000, 10_000_000])
+    parser.add_argument("--k", type=int, default=3)
+    args = parser.parse_args()
+
+    train = sample_amounts(args.rows, 0)
+    with tempfile.TemporaryDirectory() as model_dir:
+        start = time.perf_counter()
+        model = cluster_model.save(cluster_model.ClusterModel.fit(train, args.k), model_dir)
+        model = cluster_model.load(os.path.join(model_dir, os.listdir(model_dir)[0]))
+        print(f"fit + save + load on {len(train):,} amounts: {time.perf_counter() - start:.2f}s")
+    scaler = StandardScaler().fit(train.reshape(-1, 1))
+    kmeans = KMeans(n_clusters=args.k, random_state=42).fit(scaler.transform(train.reshape(-1, 1)))
+
+    print(f"\n{'batch':>12} {'refit rows/s':>14} {'predict rows/s':>14} {'assign rows/s':>14}")
+    for batch in args.batches:
+        amounts = sample_amounts(batch, 1)
+        start = time.perf_counter()
+        if batch <= 1_000_000:  # Refitting larger batches takes minutes
+            KMeans(n_clusters=args.k, random_state=42).fit_predict(
+                StandardScaler().fit_transform(amounts.reshape(-1, 1)))
+            refit = rate(batch, time.perf_counter() - start)
+        else:
+            refit = f"{'-':>14}"
+        start = time.perf_counter()
+        kmeans.predict(scaler.transform(amounts.reshape(-1, 1)))
+        predict = rate(batch, time.perf_counter() - start)
+        start = time.perf_counter()
+        model.assign(amounts)
+        assign = rate(batch, time.perf_counter() - start)
+        print(f"{batch:>12,} {refit} {predict} {assign}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Amount Clustering Benchmark: sklearn KMeans vs. exact 1-D Ckmeans
+
+- Samples transaction amounts: the Amount column of data/unsupervised_data.csv
+  with lognormal noise, rounded to cents (10M rows by default).
+- Times KMeans on the standardized amount (the old perform_clustering_and_visualize
+  path, including the center-sorting remap) and ckmeans on the raw amounts.
+- Reports seconds, rows/sec and the within-cluster sum of squares of each
+  labelling (ckmeans is the optimum, so KMeans can only match or exceed it).
+
+Usage (from the repository root):
+    python benchmarks/bench_clustering.py --rows 10000000 --k 3
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+from sklearn.cluster import KMeans
+from sklearn.preprocessing import StandardScaler
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from unsupervised.ckmeans import ckmeans, total_sse  # noqa: E402
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+
+def sample_amounts(rows):
+    base = pd.read_csv(os.path.join(DATA_DIR, "unsupervised_data.csv"))["Amount"].to_numpy(dtype=float)
+    rng = np.random.default_rng(0)
+    return np.round(rng.choice(base, rows) * rng.lognormal(0, 0.5, rows), 2)
+
+# The clustering as it was before ckmeans (kept here for comparison)
+def legacy_kmeans(amounts, k):
+    scaled = StandardScaler().fit_transform(amounts.reshape(-1, 1))
+    kmeans = KMeans(n_clusters=k, random_state=42)
+    labels = kmeans.fit_predict(scaled)
+    order = np.argsort(kmeans.cluster_centers_.ravel())
+    mapping = np.empty(k, dtype=np.int64)
+    mapping[order] = np.arange(k)
+    return mapping[labels]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--k", type=int, default=3)
+    args = parser.parse_args()
+
+    amounts = sample_amounts(args.rows)
+    print(f"{len(amounts):,} amounts, {len(np.unique(amounts)):,} distinct, k={args.k}")
+
+    start = time.perf_counter()
+    legacy = legacy_kmeans(amounts, args.k)
+    legacy_secs = time.perf_counter() - start
+
+    start = time.perf_counter()
+    exact, _ = ckmeans(amounts, args.k)
+    exact_secs = time.perf_counter() - start
+
+    print(f"{'':<10} {'seconds':>9} {'rows/s':>14} {'SSE':>16}")
+    print(f"{'KMeans':<10} {legacy_secs:>9.2f} {len(amounts) / legacy_secs:>14,.0f} "
+          f"{total_sse(amounts, legacy):>16.4g}")
+    print(f"{'ckmeans':<10} {exact_secs:>9.2f} {len(amounts) / exact_secs:>14,.0f} "
+          f"{total_sse(amounts, exact):>16.4g}  ({legacy_secs / exact_secs:.1f}x)")
+    print(f"\n{int((legacy != exact).sum()):,} rows labelled differently")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Near-Duplicate Lookup Benchmark: index size vs. lookup time
+
+- Fills a temporary index with documents whose one page has a random 64-bit
+  hash (and the same textured thumbnail, so verification always passes), in
+  steps up to --documents.
+- After each step, times lookups of fresh random hashes (nothing should
+  match) and of stored hashes with 10 flipped bits (each must find its
+  document, within MAX_DISTANCE).
+- Reports the median lookup time, the share of stored documents returned
+  as band candidates, and the recall of the 10-bit lookups.
+
+Usage (from the repository root):
+    python benchmarks/bench_near_duplicate.py --documents 20000 --lookups 200
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from supervised import near_duplicate  # noqa: E402
+
+THUMBNAIL = np.kron(np.random.default_rng(1).integers(0, 2, (8, 80)), np.ones((10, 5))).astype(np.uint8) * 255
+
+def random_hash(rng) -> int:
+    return int(rng.integers(0, 2 ** 63, dtype=np.int64)) << 1 | int(rng.integers(0, 2))
+
+def flip(phash: int, bits: int, rng) -> int:
+    for bit in rng.choice(64, size=bits, replace=False):
+        phash ^= 1 << int(bit)
+    return phash
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=20000, help="Final index size (default 20000)")
+    parser.add_argument("--lookups", type=int, default=200, help="Lookups of each kind per step")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    stored = []
+    steps = [n for n in (1000, 5000, args.documents) if n <= args.documents]
+    print(f"{'documents':>10} {'miss ms':>8} {'candidates':>11} {'hit ms':>8} {'recall':>7}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        index = near_duplicate.NearDuplicateIndex(os.path.join(tmp_dir, "index.sqlite"))
+        for size in steps:
+            while len(stored) < size:
+                phash = random_hash(rng)
+                stored.append((index.add("payslip", [(phash, THUMBNAIL)], {}), phash))
+
+            miss_times, candidates = [], []
+            for _ in range(args.lookups):
+                phash = random_hash(rng)
+                start = time.perf_counter()
+                index.lookup("payslip", [(phash, THUMBNAIL)])
+                miss_times.append(time.perf_counter() - start)
+                candidates.append(len(index._candidates("payslip", phash, 1)))
+
+            hit_times, found = [], 0
+            for n in rng.choice(len(stored), size=args.lookups, replace=False):
+                doc_id, phash = stored[n]
+                start = time.perf_counter()
+                match = index.lookup("payslip", [(flip(phash, 10, rng), THUMBNAIL)])
+                hit_times.append(time.perf_counter() - start)
+                found += match is not None and match[0] == doc_id
+
+            print(f"{size:>10} {statistics.median(miss_times) * 1000:>8.1f} "
+                  f"{statistics.mean(candidates) / size:>10.1%} {statistics.median(hit_times) * 1000:>8.1f} "
+                  f"{found / args.lookups:>7.1%}")
+
+if __name__ == "__main__":
+    main()
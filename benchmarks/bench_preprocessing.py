@@ -0,0 +1,105 @@
+"""
+Preprocessing Benchmark: latency vs. accuracy
+
+- Runs the sample images in data/ through the old preprocessing
+  (grayscale + Otsu) and the shared normalization stage.
+- Also runs a "phone photo" copy of each sample upscaled to 4000px.
+- Times preprocessing and Tesseract separately.
+- Scores accuracy as the share of reference values (data/*_data.csv) found in the OCR text.
+- Without a tesseract binary only preprocessing latency and the OCR input
+  size are measured; OCR latency and accuracy are reported as not measured.
+
+Usage (from the repository root):
+    python benchmarks/bench_preprocessing.py
+"""
+
+import os
+import re
+import sys
+import time
+
+import cv2
+import pandas as pd
+import pytesseract
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from supervised import ocr_engine, preprocessing  # noqa: E402  (also sets the tesseract path)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+SAMPLES = [
+    ("payslip", "payslip_image.webp", "payslip_data.csv", ocr_engine.DEFAULT_CONFIG),
+    ("invoice", "invoice_image.png", "invoice_data.csv", ""),
+    ("profit_loss", "profit_loss_image.jpg", "profit_loss_data.csv", ocr_engine.DEFAULT_CONFIG),
+]
+PHONE_LONG_SIDE = 4000
+
+def baseline(img):
+    gray = preprocessing.to_gray(img)
+    _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return thresh
+
+def normalized(img):
+    return preprocessing.prepare_for_ocr(img)
+
+# Reference tokens: every non-empty cell of the saved extraction CSV
+def reference_tokens(csv_name):
+    df = pd.read_csv(os.path.join(DATA_DIR, csv_name), dtype=str)
+    tokens = set()
+    for value in df.values.ravel():
+        if isinstance(value, str):
+            value = re.sub(r"\.0+$", "", value.strip().replace("$", "").replace(",", ""))
+            tokens.update(t.lower() for t in value.split() if t)
+    return tokens
+
+def accuracy(text, tokens):
+    words = {re.sub(r"[$,|]", "", w).lower() for w in text.split()}
+    return sum(t in words for t in tokens) / len(tokens) if tokens else 0.0
+
+def upscale(img, long_side):
+    factor = long_side / max(img.shape[:2])
+    return cv2.resize(img, None, fx=factor, fy=factor, interpolation=cv2.INTER_CUBIC)
+
+def has_tesseract():
+    try:
+        pytesseract.get_tesseract_version()
+        return True
+    except (pytesseract.TesseractNotFoundError, OSError):
+        return False
+
+def run(img, preprocess, config, repeats=3, ocr=True):
+    prep_times, ocr_times, text = [], [], None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        processed = preprocess(img)
+        prep_times.append(time.perf_counter() - start)
+        if ocr:
+            start = time.perf_counter()
+            text = pytesseract.image_to_string(processed, config=config)
+            ocr_times.append(time.perf_counter() - start)
+    return min(prep_times), min(ocr_times) if ocr_times else None, processed.shape, text
+
+def main():
+    ocr = has_tesseract()
+    if not ocr:
+        print("tesseract not found: OCR latency and accuracy are NOT measured, preprocessing only\n")
+    rows = []
+    for name, image_name, csv_name, config in SAMPLES:
+        original = cv2.imread(os.path.join(DATA_DIR, image_name), cv2.IMREAD_COLOR)
+        if original is None:
+            print(f"Skipping {image_name}: could not read image")
+            continue
+        tokens = reference_tokens(csv_name)
+        for source, img in (("sample", original), ("phone-4000px", upscale(original, PHONE_LONG_SIDE))):
+            for mode, preprocess in (("baseline", baseline), ("normalized", normalized)):
+                prep_s, ocr_s, shape, text = run(img, preprocess, config, ocr=ocr)
+                row = {"document": name, "input": source, "mode": mode,
+                       "ocr_input": f"{shape[1]}x{shape[0]}",
+                       "preprocess_ms": round(prep_s * 1000, 1)}
+                if ocr:
+                    row.update(ocr_ms=round(ocr_s * 1000, 1), total_ms=round((prep_s + ocr_s) * 1000, 1),
+                               accuracy=round(accuracy(text, tokens), 3))
+                rows.append(row)
+    print(pd.DataFrame(rows).to_string(index=False))
+
+if __name__ == "__main__":
+    main()
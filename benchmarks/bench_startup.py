@@ -0,0 +1,84 @@
+"""
+App Startup Benchmark: eager pipeline imports vs. the lazy registry
+
+- Runs each scenario in a fresh interpreter with `python -X importtime`:
+  - eager: every pipeline module imported up front (what app.py used to do)
+  - lazy: streamlit + pandas + the pipelines registry (what app.py imports now)
+  - lazy + one pipeline: the cost when a single document type is first used
+- Single runs are noisy (disk cache, other processes), so every scenario
+  runs --repeat times after one untimed warm-up run, with the scenarios
+  interleaved round by round. Reports the median wall time and import time
+  per scenario with the wall-time range, and the slowest top-level imports
+  of the eager scenario (median over its runs).
+
+Usage (from the repository root):
+    python benchmarks/bench_startup.py --repeat 15
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+import pipelines  # noqa: E402  (light: no pipeline is imported here)
+
+BASE = "import streamlit, pandas"
+EAGER = BASE + "; " + "; ".join(f"import {target.split(':')[0]}" for target in pipelines.PIPELINES.values())
+SCENARIOS = [
+    ("eager (all pipelines)", EAGER),
+    ("lazy (registry only)", BASE + "; import pipelines"),
+    ("lazy + Invoice on first use", BASE + "; import pipelines; pipelines.get('Invoice')"),
+]
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s+)(\S+)")
+
+# One fresh interpreter: (wall seconds, [(cumulative_us, module) for top-level imports])
+def run(code):
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT,
+                          capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    top_level = []
+    for line in proc.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match and len(match.group(3)) == 1:  # One space of indent = imported by the script itself
+            top_level.append((int(match.group(2)), match.group(4)))
+    return wall, top_level
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=15, help="Timed runs per scenario; the median is reported")
+    args = parser.parse_args()
+
+    for _, code in SCENARIOS:
+        run(code)  # Warm-up: the first interpreter pays for a cold disk cache
+    runs = {name: [] for name, _ in SCENARIOS}
+    for _ in range(args.repeat):
+        for name, code in SCENARIOS:  # Interleaved, so drift hits every scenario alike
+            runs[name].append(run(code))
+
+    print(f"{args.repeat} runs per scenario, median (wall range)")
+    print(f"{'scenario':<30} {'wall s':>8} {'range s':>13} {'imports s':>10}")
+    for name, _ in SCENARIOS:
+        walls = [wall for wall, _ in runs[name]]
+        imports = [sum(us for us, _ in top_level) / 1e6 for _, top_level in runs[name]]
+        print(f"{name:<30} {statistics.median(walls):>8.2f} {min(walls):>6.2f}-{max(walls):<6.2f} "
+              f"{statistics.median(imports):>10.2f}")
+
+    print("\nSlowest imports when everything is eager:")
+    eager = {}
+    for _, top_level in runs[SCENARIOS[0][0]]:
+        for us, module in top_level:
+            eager.setdefault(module, []).append(us)
+    for us, module in sorted(((statistics.median(times), module) for module, times in eager.items()),
+                             reverse=True)[:10]:
+        print(f"  {us / 1e6:>6.2f}s  {module}")
+
+if __name__ == "__main__":
+    main()
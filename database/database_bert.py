@@ -1,8 +1,12 @@
 import os
+import sys
 import pymysql
-import pandas as pd
 from dotenv import load_dotenv
 
+# Repository root on the path for the shared output store
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from storage import output_store  # noqa: E402
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -36,9 +40,10 @@ CREATE TABLE IF NOT EXISTS unsupervised (
 cursor.execute(create_table_query)
 connection.commit()
 
-# Read CSV
+# Read clustered transactions from the output store (falls back to the old CSV export)
 csv_path = r"C:\BFSI_OCR\data\clustered_transactions.csv"
-df = pd.read_csv(csv_path, dtype=str)
+df = output_store.read_or_csv("clustered_transactions", csv_path,
+                              columns=["Transaction ID", "Description", "Amount", "Cluster_KMeans_Mapped"])
 
 # Rename columns to match MySQL
 df.columns = ["Transaction_ID", "Description", "Amount", "Cluster_KMeans", "Cluster_KMeans_Mapped"]
@@ -1,8 +1,13 @@
 import os
+import sys
 from dotenv import load_dotenv
 import pymysql
 import pandas as pd
 
+# Repository root on the path for the shared output store
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from storage import output_store  # noqa: E402
+
 # Load environment variables
 load_dotenv()
 
@@ -20,8 +25,9 @@ except pymysql.MySQLError as e:
     print(f"Error: {e}")
     exit()
 
-# Load CSV
-df = pd.read_csv(r"C:\BFSI_OCR\data\invoice_data.csv", dtype=str)
+# Load invoice rows from the output store (falls back to the old CSV export)
+df = output_store.read_or_csv("invoice", r"C:\BFSI_OCR\data\invoice_data.csv",
+                              columns=["Description", "Qty", "Price", "Total"])
 
 # Check column names before stripping
 print("Columns in CSV before stripping spaces:", df.columns)
@@ -1,7 +1,12 @@
 import os
+import sys
 from dotenv import load_dotenv
 import pymysql
 
+# Repository root on the path for the shared output store
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from storage import output_store  # noqa: E402
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -19,10 +24,9 @@ except pymysql.MySQLError as e:
     print(f"Error: {e}")
 
 
-import pandas as pd 
-
 cursor=connection.cursor()
-df=pd.read_csv(r"C:\BFSI_OCR\data\payslip_data.csv" , dtype=str)
+# Payslip rows from the output store (falls back to the old CSV export)
+df = output_store.read_or_csv("payslip", r"C:\BFSI_OCR\data\payslip_data.csv", columns=["Category", "Amount"])
 sql = """INSERT INTO payslips (Payslip_ID, Basic_Salary, Conveyance_Allowances, House_Rent_Allowances, Medical_Allowances, Special_Allowances) 
 VALUES (%s, %s, %s, %s, %s, %s)"""
 
@@ -1,7 +1,12 @@
 import os
+import sys
 from dotenv import load_dotenv
 import pymysql
 
+# Repository root on the path for the shared output store
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from storage import output_store  # noqa: E402
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -19,10 +24,10 @@ except pymysql.MySQLError as e:
     print(f"Error: {e}")
 
 
-import pandas as pd 
-
 cursor=connection.cursor()
-df=pd.read_csv(r"C:\BFSI_OCR\data\profit_loss_data.csv" , dtype=str)
+# Expense rows from the output store (falls back to the old CSV export)
+df = output_store.read_or_csv("profit_loss", r"C:\BFSI_OCR\data\profit_loss_data.csv",
+                              columns=["Allowable Business Expenses", "Amount"])
 sql = """INSERT INTO  business_expenses(Expense_Type, Amount)VALUES (%s, %s)"""
 
 try:
@@ -0,0 +1,206 @@
+"""
+Background Job Queue
+
+- Uploads become jobs in a SQLite table (data/jobs.sqlite): document type,
+  content hash, input bytes, status, pages done / total, pickled result
+  and error.
+- A bounded pool of worker threads runs the pipelines (JOB_WORKERS,
+  default one per CPU), so a huge PDF occupies one worker and never blocks the
+  Streamlit script thread or other users' jobs beyond that.
+- Pipelines report page progress through supervised.progress; the UI
+  polls the job row. Several uploads are several jobs, processed
+  concurrently.
+- Jobs outlive the browser session: the UI keeps the job id in the URL,
+  and jobs still queued or running when the server stopped are resumed
+  on the next start.
+- Submitting the same document (type + content) again returns its existing
+  job, failed ones included (their error is shown; a new run only happens
+  through retry()). Jobs are keyed on the code/rules version of their
+  pipeline as well (pipelines.version), so results of older code or rules
+  are not reused.
+- Finished jobs expire after JOB_TTL seconds (default a week). Expired jobs
+  and finished jobs of an older version are deleted (prune), on start and
+  at most every JOB_PRUNE_SECONDS, so results do not pile up in the table.
+- Inputs of pipelines that stream from a file (pipelines.FILE_INPUTS, the
+  clustering CSV) are written to a per-job directory (JOB_FILES_DIR) instead
+  of the table; files the pipeline writes there (the clustered CSV) live as
+  long as the job.
+"""
+
+import os
+import time
+import uuid
+import pickle
+import shutil
+import sqlite3
+import hashlib
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+import pipelines
+from supervised import progress
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DB = os.getenv("JOB_DB", os.path.join(current_dir, "data", "jobs.sqlite"))
+# Workers mostly wait on the shared OCR process pool, so a batch of uploads can all be in flight
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", str(os.cpu_count() or 2)))
+JOB_FILES_DIR = os.getenv("JOB_FILES_DIR", os.path.join(current_dir, "data", "job_files"))
+JOB_TTL = int(os.getenv("JOB_TTL", str(7 * 24 * 3600)))  # Seconds a finished job is reused for
+JOB_PRUNE_SECONDS = 600
+ACTIVE = ("queued", "running")
+FINISHED = ("done", "failed")
+
+def _timestamp(seconds: float) -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(seconds))
+
+# Directory of a job's input and output files
+def _job_dir(job_id: str) -> str:
+    return os.path.join(JOB_FILES_DIR, job_id)
+
+
+class JobQueue:
+    """SQLite-backed jobs run by a bounded thread pool."""
+
+    def __init__(self, db_path: str = DEFAULT_DB, max_workers: int = JOB_WORKERS, ttl: int = JOB_TTL):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                doc_type TEXT NOT NULL,
+                name TEXT,
+                content_hash TEXT NOT NULL,
+                version TEXT,
+                input BLOB,
+                status TEXT NOT NULL,
+                pages_done INTEGER NOT NULL DEFAULT 0,
+                pages_total INTEGER NOT NULL DEFAULT 0,
+                result BLOB,
+                error TEXT,
+                created TEXT NOT NULL,
+                updated TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_content ON jobs (doc_type, content_hash);
+        """)
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")]
+        if "name" not in columns:  # Table created before jobs had names
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN name TEXT")
+        if "version" not in columns:  # Table created before jobs had versions (pruned below)
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN version TEXT")
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self.max_workers = max_workers
+        self.ttl = ttl
+        self._pruned_at = 0.0
+        self.prune()
+        self._resume()
+
+    def _execute(self, sql: str, params=()):
+        with self._lock, self._conn:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _update(self, job_id: str, **fields):
+        fields["updated"] = _timestamp(time.time())
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        self._execute(f"UPDATE jobs SET {assignments} WHERE id = ?", list(fields.values()) + [job_id])
+
+    # Jobs interrupted by a server restart go back on the pool
+    def _resume(self):
+        for (job_id,) in self._execute("SELECT id FROM jobs WHERE status IN (?, ?) ORDER BY created", ACTIVE):
+            self._update(job_id, status="queued")
+            self._pool.submit(self._run, job_id)
+
+    # Queue a document; returns the job id. The latest unexpired job for the same document and
+    # version is reused whatever its status; with retry=True a failed one is run again.
+    def submit(self, doc_type: str, data: bytes, name: Optional[str] = None, retry: bool = False) -> str:
+        if time.time() - self._pruned_at > JOB_PRUNE_SECONDS:
+            self.prune()
+        content_hash = hashlib.sha256(data).hexdigest()
+        version = pipelines.version(doc_type)
+        existing = self._execute(
+            "SELECT id, status FROM jobs WHERE doc_type = ? AND content_hash = ? AND version = ? "
+            "AND (status IN (?, ?) OR updated >= ?) ORDER BY created DESC LIMIT 1",
+            (doc_type, content_hash, version) + ACTIVE + (_timestamp(time.time() - self.ttl),))
+        if existing and not (retry and existing[0][1] == "failed"):
+            return existing[0][0]
+        job_id = uuid.uuid4().hex
+        now = _timestamp(time.time())
+        if doc_type in pipelines.FILE_INPUTS:
+            os.makedirs(_job_dir(job_id), exist_ok=True)
+            with open(os.path.join(_job_dir(job_id), "input"), "wb") as f:
+                f.write(data)
+            data = None
+        self._execute("INSERT INTO jobs (id, doc_type, name, content_hash, version, input, status, created, updated) "
+                      "VALUES (?, ?, ?, ?, ?, ?, 'queued', ?, ?)",
+                      (job_id, doc_type, name, content_hash, version, None if data is None else bytes(data), now, now))
+        self._pool.submit(self._run, job_id)
+        return job_id
+
+    # Delete finished jobs (and their results) that expired or came from older code or rules.
+    # Returns how many were deleted.
+    def prune(self) -> int:
+        self._pruned_at = time.time()
+        cutoff = _timestamp(self._pruned_at - self.ttl)
+        doomed = [job_id for job_id, doc_type, version, updated in self._execute(
+                      "SELECT id, doc_type, version, updated FROM jobs WHERE status IN (?, ?)", FINISHED)
+                  if updated < cutoff or doc_type not in pipelines.PIPELINES
+                  or version != pipelines.version(doc_type)]
+        for start in range(0, len(doomed), 500):
+            batch = doomed[start:start + 500]
+            self._execute(f"DELETE FROM jobs WHERE id IN ({', '.join('?' * len(batch))})", batch)
+        for job_id in doomed:
+            shutil.rmtree(_job_dir(job_id), ignore_errors=True)
+        return len(doomed)
+
+    def _run(self, job_id: str):
+        rows = self._execute("SELECT doc_type, input FROM jobs WHERE id = ?", (job_id,))
+        if not rows:
+            return
+        doc_type, data = rows[0]
+        input_path = os.path.join(_job_dir(job_id), "input")
+        if data is None and os.path.exists(input_path):
+            data = input_path
+        self._update(job_id, status="running")
+        try:
+            with progress.reporting(lambda done, total: self._update(job_id, pages_done=done, pages_total=total)):
+                result = pipelines.run(doc_type, data, _job_dir(job_id))
+            done = self._execute("SELECT pages_total FROM jobs WHERE id = ?", (job_id,))[0][0] or 1
+            # The input is no longer needed once the result is stored
+            self._update(job_id, status="done", result=pickle.dumps(result), input=None,
+                         pages_done=done, pages_total=done)
+        except Exception as e:
+            print(traceback.format_exc())
+            self._update(job_id, status="failed", error=f"{type(e).__name__}: {e}", input=None)
+        if os.path.exists(input_path):
+            os.remove(input_path)
+
+    # Status row of a job (no result payload), or None for an unknown id
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        keys = ("id", "doc_type", "name", "status", "pages_done", "pages_total", "error", "created", "updated")
+        rows = self._execute(f"SELECT {', '.join(keys)} FROM jobs WHERE id = ?", (job_id,))
+        if not rows:
+            return None
+        return dict(zip(keys, rows[0]))
+
+    # Result of a finished job (None until it is done)
+    def result(self, job_id: str) -> Any:
+        rows = self._execute("SELECT result FROM jobs WHERE id = ? AND status = 'done'", (job_id,))
+        return pickle.loads(rows[0][0]) if rows and rows[0][0] is not None else None
+
+    # Jobs per status, plus the pool size
+    def stats(self) -> Dict[str, int]:
+        counts = dict(self._execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"))
+        counts["workers"] = self.max_workers
+        return counts
+
+
+_queue: Optional[JobQueue] = None
+_queue_lock = threading.Lock()
+
+def get_queue() -> JobQueue:
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue()
+        return _queue
@@ -0,0 +1,128 @@
+"""
+Lazy Pipeline Registry
+
+- Maps each document type in the app to the function that processes it,
+  as "module:function" strings, so nothing heavy (cv2, pytesseract,
+  pdfplumber, sklearn, seaborn) is imported at startup.
+- A pipeline's module is imported with importlib the first time its
+  document type is used, and the import time is recorded.
+- Other pipelines can be preloaded on a background thread
+  (PRELOAD_PIPELINES="all" or a comma-separated list of document types).
+- version() fingerprints the code and rules a document type's results come
+  from, so stored results can be retired when either changes.
+"""
+
+import os
+import glob
+import time
+import hashlib
+import tempfile
+import importlib
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+PIPELINES = {
+    "Payslip": "supervised.payslip:process_payslip",
+    "Profit & Loss": "supervised.profit_loss:process_image",
+    "Invoice": "supervised.invoice:process_invoice",
+    "Bank Statement": "supervised.statement_ingest:ingest_bank_statement",
+    "Unsupervised Data": "unsupervised.clustering:cluster_upload",
+    "Semi-supervised API": "semi_supervised.api_visualization:plot_payment_mode_distribution",
+}
+PRELOAD = os.getenv("PRELOAD_PIPELINES", "")
+# Document types whose pipeline streams its input from a file (the job queue keeps them on disk)
+FILE_INPUTS = ("Unsupervised Data",)
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+# Files besides the code that change a document type's results
+VERSION_INPUTS = {
+    "Bank Statement": [os.getenv("CATEGORY_RULES", os.path.join(current_dir, "data", "category_rules.json"))],
+}
+
+_loaded: Dict[str, Callable] = {}
+_import_seconds: Dict[str, float] = {}
+_lock = threading.Lock()
+_versions: Dict[str, Tuple[list, str]] = {}
+
+# Processing function for a document type, importing its module on first use
+def get(doc_type: str) -> Callable:
+    with _lock:
+        if doc_type in _loaded:
+            return _loaded[doc_type]
+    # importlib's per-module locks make a concurrent preload of the same module safe
+    module_name, function_name = PIPELINES[doc_type].split(":")
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    with _lock:
+        _import_seconds.setdefault(doc_type, round(time.perf_counter() - start, 3))
+        _loaded[doc_type] = getattr(module, function_name)
+        return _loaded[doc_type]
+
+# Process one uploaded document (its bytes, or the path of a FILE_INPUTS upload) with the
+# pipeline for its type. Files a pipeline writes (the clustered CSV) go to work_dir.
+def run(doc_type: str, data: Union[bytes, str], work_dir: Optional[str] = None):
+    process = get(doc_type)
+    if doc_type == "Unsupervised Data":
+        from io import BytesIO
+        # Clustered chunk by chunk into a CSV; only a summary and a sample come back
+        work_dir = work_dir or tempfile.mkdtemp(prefix="clustering-")
+        source = data if isinstance(data, str) else BytesIO(data)
+        return process(source, os.path.join(work_dir, "clustered_transactions.csv"))
+    if isinstance(data, str):
+        with open(data, "rb") as f:
+            data = f.read()
+    return process(data)
+
+# Code and rules a document type's results depend on: the pipeline's package, the shared
+# modules and its VERSION_INPUTS
+def _version_files(doc_type: str) -> List[str]:
+    package = PIPELINES[doc_type].split(".")[0]
+    patterns = [os.path.join(current_dir, package, "*.py"), os.path.join(current_dir, "storage", "*.py"),
+                os.path.join(current_dir, "pipelines.py")] + VERSION_INPUTS.get(doc_type, [])
+    return sorted(path for pattern in patterns for path in glob.glob(pattern))
+
+# Short hash of the contents of those files and of JOB_CODE_VERSION (to retire results by hand).
+# Files are re-read only when their size or mtime changes.
+def version(doc_type: str) -> str:
+    key = [os.getenv("JOB_CODE_VERSION", "")] + [(path, stat.st_size, stat.st_mtime_ns) for path, stat in
+                                                 ((path, os.stat(path)) for path in _version_files(doc_type))]
+    with _lock:
+        cached = _versions.get(doc_type)
+        if cached and cached[0] == key:
+            return cached[1]
+    digest = hashlib.sha256(key[0].encode())
+    for path, _, _ in key[1:]:
+        digest.update(os.path.relpath(path, current_dir).encode())
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    with _lock:
+        _versions[doc_type] = (key, digest.hexdigest()[:16])
+        return _versions[doc_type][1]
+
+# Import pipelines on a daemon thread so the first request for them doesn't pay the import
+def preload(doc_types: Optional[Iterable[str]] = None) -> threading.Thread:
+    doc_types = list(doc_types if doc_types is not None else PIPELINES)
+
+    def run():
+        for doc_type in doc_types:
+            try:
+                get(doc_type)
+            except Exception as e:  # A missing optional dependency must not take the app down
+                print(f"Could not preload the {doc_type} pipeline: {e}")
+
+    thread = threading.Thread(target=run, name="pipeline-preload", daemon=True)
+    thread.start()
+    return thread
+
+# Document types named by PRELOAD_PIPELINES ("all" for every pipeline)
+def preload_from_env() -> Optional[threading.Thread]:
+    if not PRELOAD.strip():
+        return None
+    if PRELOAD.strip().lower() == "all":
+        return preload()
+    return preload([name.strip() for name in PRELOAD.split(",") if name.strip() in PIPELINES])
+
+# Seconds spent importing each loaded pipeline (this process)
+def stats() -> Dict[str, float]:
+    with _lock:
+        return dict(_import_seconds)
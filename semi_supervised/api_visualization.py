@@ -11,7 +11,7 @@ Payment Mode Distribution Visualization
 
 import os
 import pandas as pd 
-import matplotlib.pyplot as plt
+from supervised import charts
 import io
 import base64
 
@@ -42,7 +42,7 @@ def plot_payment_mode_distribution():
     ]
 
     # Pie chart for Payment Mode Distribution by Amount
-    fig, ax = plt.subplots(figsize=(7, 7))
+    fig, ax = charts.new_figure((7, 7))  # Own figure, not pyplot's global one
     ax.pie(payment_amounts, labels=payment_amounts.index, autopct="%1.1f%%", colors=colors)
     ax.set_title("Payment Mode Distribution by Amount",fontsize=16)
     # Save to a BytesIO object
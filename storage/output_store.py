@@ -0,0 +1,143 @@
+"""
+Output Store (columnar, append-only)
+
+- Pipelines append typed, zstd-compressed Parquet files instead of
+  overwriting CSVs under C:\\BFSI_OCR\\data.
+- Layout: <root>/<doc_type>/date=YYYY-MM-DD/part-<time>-<id>.parquet
+  (partitioned by document type and ingestion date). Files are never
+  rewritten; each append adds a new part.
+- The root comes from OUTPUT_STORE_DIR (default data/store).
+- Reads memory-map the files and push column projection and row filters
+  (including date ranges on the partition) down to the Parquet scan.
+- Every appended row gets an "Ingested At" timestamp, and a "Document ID"
+  (document_key: hash of the uploaded file) when the caller passes one, so
+  rows can be traced back to their upload and a document already stored can
+  be skipped (has_document).
+"""
+
+import os
+import time
+import uuid
+import hashlib
+import threading
+from datetime import date
+from typing import List, Optional, Sequence, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pyarrow import fs
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_ROOT = os.getenv("OUTPUT_STORE_DIR", os.path.join(current_dir, "..", "data", "store"))
+COMPRESSION = "zstd"
+PARTITIONING = ds.partitioning(pa.schema([("date", pa.string())]), flavor="hive")
+DOCUMENT_COLUMN = "Document ID"
+INGESTED_COLUMN = "Ingested At"
+
+Filter = Tuple[str, str, object]  # (column, op, value), e.g. ("Category", "==", "Food")
+
+
+class OutputStore:
+    """Append-only Parquet datasets, one per document type."""
+
+    def __init__(self, root: str = DEFAULT_ROOT):
+        self.root = root
+        self._filesystem = fs.LocalFileSystem(use_mmap=True)
+
+    def _dataset_dir(self, doc_type: str) -> str:
+        return os.path.join(self.root, doc_type)
+
+    # Append rows as a new Parquet part under today's (or the given) date partition, stamped with
+    # the ingestion time and document_id (if given); returns its path
+    def append(self, doc_type: str, df: pd.DataFrame, partition_date: Optional[date] = None,
+               document_id: Optional[str] = None) -> Optional[str]:
+        if df is None or df.empty:
+            return None
+        stamps = {INGESTED_COLUMN: pd.Timestamp.now().floor("s")}
+        if document_id is not None:
+            stamps[DOCUMENT_COLUMN] = document_id
+        df = df.assign(**stamps)  # A copy: the caller's frame is left alone
+        partition = (partition_date or date.today()).isoformat()
+        directory = os.path.join(self._dataset_dir(doc_type), f"date={partition}")
+        os.makedirs(directory, exist_ok=True)
+        name = f"part-{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}.parquet"
+        path = os.path.join(directory, name)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        tmp_path = path + ".tmp"
+        pq.write_table(table, tmp_path, compression=COMPRESSION)
+        os.replace(tmp_path, path)  # Readers never see a half-written part
+        return path
+
+    def exists(self, doc_type: str) -> bool:
+        return bool(self._parts(doc_type))
+
+    def _parts(self, doc_type: str) -> List[str]:
+        parts = []
+        for directory, _, files in os.walk(self._dataset_dir(doc_type)):
+            parts.extend(os.path.join(directory, f) for f in files if f.endswith(".parquet"))
+        return sorted(parts)
+
+    # Parts written from different batches may type an all-empty column as null; unify them
+    def _schema(self, parts: List[str]) -> pa.Schema:
+        return pa.unify_schemas([pq.read_schema(p, memory_map=True) for p in parts] +
+                                [pa.schema([("date", pa.string())])])
+
+    # Whether rows of this document were already appended
+    def has_document(self, doc_type: str, document_id: str) -> bool:
+        parts = self._parts(doc_type)
+        if not parts or DOCUMENT_COLUMN not in self._schema(parts).names:
+            return False
+        return not self.read(doc_type, [DOCUMENT_COLUMN], [(DOCUMENT_COLUMN, "==", document_id)]).empty
+
+    # Rows of a document type, reading only the requested columns and matching rows.
+    # since/until bound the date partition (inclusive, ISO dates); filters are (column, op, value).
+    def read(self, doc_type: str, columns: Optional[Sequence[str]] = None,
+             filters: Optional[Sequence[Filter]] = None,
+             since: Optional[str] = None, until: Optional[str] = None) -> pd.DataFrame:
+        parts = self._parts(doc_type)
+        if not parts:
+            return pd.DataFrame(columns=list(columns) if columns else None)
+        dataset = ds.dataset(parts, schema=self._schema(parts), format="parquet", filesystem=self._filesystem,
+                             partitioning=PARTITIONING, partition_base_dir=self._dataset_dir(doc_type))
+        expression = pq.filters_to_expression(list(filters)) if filters else None
+        for op, bound in ((">=", since), ("<=", until)):
+            if bound is not None:
+                condition = pq.filters_to_expression([("date", op, str(bound))])
+                expression = condition if expression is None else expression & condition
+        table = dataset.to_table(columns=list(columns) if columns else None, filter=expression)
+        return table.to_pandas()
+
+
+_store: Optional[OutputStore] = None
+_store_lock = threading.Lock()
+
+def get_store() -> OutputStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = OutputStore()
+        return _store
+
+# Key identifying an uploaded document in the store (hash of its bytes)
+def document_key(data) -> str:
+    return hashlib.sha256(data).hexdigest()[:16]
+
+def append(doc_type: str, df: pd.DataFrame, partition_date: Optional[date] = None,
+           document_id: Optional[str] = None) -> Optional[str]:
+    return get_store().append(doc_type, df, partition_date, document_id)
+
+def has_document(doc_type: str, document_id: str) -> bool:
+    return get_store().has_document(doc_type, document_id)
+
+def read(doc_type: str, columns: Optional[Sequence[str]] = None, filters: Optional[Sequence[Filter]] = None,
+         since: Optional[str] = None, until: Optional[str] = None) -> pd.DataFrame:
+    return get_store().read(doc_type, columns, filters, since, until)
+
+# Loader helper: rows as strings (like read_csv(dtype=str)) from the store,
+# or from the legacy CSV export when nothing was stored yet
+def read_or_csv(doc_type: str, csv_path: str, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    if get_store().exists(doc_type):
+        return read(doc_type, columns).astype("string")
+    return pd.read_csv(csv_path, dtype=str, usecols=columns)
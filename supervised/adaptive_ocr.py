@@ -0,0 +1,98 @@
+"""
+Confidence-Gated Adaptive OCR
+
+- Runs the cheap configuration first (the extractor's own preprocessing and PSM).
+- Checks the mean word confidence from image_to_data and whether the
+  expected fields parse.
+- Escalates step by step to heavier preprocessing only when needed:
+  upscaling + adaptive thresholding, then denoising + a different PSM.
+- Keeps the best attempt when no step passes the gate.
+- Counts the final step of every document in process (stats()) and logs its
+  escalation path at debug level, so we can see how often the expensive path
+  runs. A JSON lines trace is written only when OCR_ESCALATION_LOG is set
+  (off by default: no disk write on the request path).
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import Counter
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from supervised import document_ocr, preprocessing
+from supervised.ocr_result import OCRResult
+
+MIN_CONFIDENCE = float(os.getenv("OCR_MIN_CONFIDENCE", "70"))
+ESCALATION_LOG = os.getenv("OCR_ESCALATION_LOG", "")
+
+# Escalation ladder: (name, preprocess or None for the extractor's own, config or None for its own)
+LADDER = [
+    ("norm", None, None),
+    ("upscaled-adaptive", partial(preprocessing.prepare_for_ocr, target_height=32, adaptive=True), None),
+    ("denoised-psm4", partial(preprocessing.prepare_for_ocr, target_height=32, denoise=True, adaptive=True),
+     r'--oem 3 --psm 4'),
+]
+
+logger = logging.getLogger(__name__)
+_final_steps = Counter()
+_stats_lock = threading.Lock()
+
+# Count one document's final step; the full path goes to the debug log and, if enabled, the JSONL trace
+def record_path(doc_type: str, data, path: List[Dict[str, Any]]):
+    final_step = path[-1]["step"]
+    with _stats_lock:
+        _final_steps[(doc_type, final_step)] += 1
+    logger.debug("%s OCR finished on %s after %d escalation(s): %s", doc_type, final_step, len(path) - 1, path)
+    if not ESCALATION_LOG:
+        return
+    entry = {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "doc_type": doc_type,
+        "document": hashlib.sha256(data).hexdigest()[:16],
+        "final_step": final_step,
+        "escalations": len(path) - 1,
+        "path": path,
+    }
+    with _stats_lock:
+        try:
+            with open(ESCALATION_LOG, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+        except OSError as e:
+            logger.warning("Could not write OCR escalation log %s: %s", ESCALATION_LOG, e)
+
+# OCR with escalation; returns (OCR result, parsed value, escalation path)
+def adaptive_ocr(data, doc_type: str, config: str,
+                 preprocess: Callable[[np.ndarray], np.ndarray],
+                 parse: Callable[[OCRResult], Any], is_valid: Callable[[Any], bool],
+                 section: Optional[Tuple[str, str]] = None,
+                 min_confidence: float = MIN_CONFIDENCE) -> Tuple[OCRResult, Any, List[Dict[str, Any]]]:
+    path = []
+    best = None
+    for name, step_preprocess, step_config in LADDER:
+        start = time.perf_counter()
+        result = document_ocr.ocr_document(data, f"{doc_type}-{name}", step_config or config,
+                                           step_preprocess or preprocess, section=section)
+        parsed = parse(result)
+        confidence = result.mean_confidence()
+        valid = bool(is_valid(parsed))
+        path.append({"step": name, "confidence": round(confidence, 1), "parsed": valid,
+                     "seconds": round(time.perf_counter() - start, 3)})
+        score = (valid, confidence)
+        if best is None or score > best[0]:
+            best = (score, result, parsed)
+        if valid and confidence >= min_confidence:
+            break
+    record_path(doc_type, data, path)
+    _, result, parsed = best
+    return result, parsed, path
+
+# How often each document type finished on each ladder step (this process)
+def stats() -> Dict[str, int]:
+    with _stats_lock:
+        return {f"{doc_type}:{step}": count for (doc_type, step), count in sorted(_final_steps.items())}
@@ -1,38 +1,168 @@
 """
 Bank Statement Processing & Visualization
 
-- Extracts tables from PDFs and saves as CSV.
-- Cleans and categorizes transaction descriptions.
+- Extracts tables from PDFs page by page as typed row batches (generator).
+- Parses pages from word coordinates with a cached layout template when the
+  bank's layout is known; table detection only runs on unknown layouts.
+- Optionally splits the pages into ranges extracted by worker processes,
+  merged back in page order. Only some pages can be extracted
+  (iter_numbered_pages), for incremental ingestion.
+- Categorizes each batch as it arrives; saving to CSV is an optional per-batch sink.
+- Cleans and categorizes transaction descriptions (rules in data/category_rules.json).
 - Analyzes spending per category.
 - Generates pie, bar, and scatter charts for visualization.
 - Integrates with Streamlit for web display.
 """
 
+import os
 import pdfplumber
 import pandas as pd
+import numpy as np
 import re
-import matplotlib.pyplot as plt
+import tempfile
+from io import BytesIO
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
 import streamlit as st
+from supervised import categorizer, charts, progress, statement_template
 
-# Function to extract data from the PDF and save it to a CSV
-def extract_data_from_pdf(pdf_path, csv_path):
-    transactions = []
+STATEMENT_COLUMNS = ["Post Date", "Value Date", "Description", "DR", "CR", "Balance"]
+KNOWN_HEADERS = {re.sub(r"\s+", "", column).lower(): column for column in STATEMENT_COLUMNS}
+# Description normalization patterns (compiled once)
+SPECIAL_CHARS = re.compile(r"[^a-z0-9\s@]")
+WHITESPACE = re.compile(r"\s+")
+# Standalone UPI/IMPS reference numbers (12 digits, maybe glued to the bank code) and
+# NEFT/RTGS UTRs ("idfbh19280489297"); digits joined to '@' are phone-number UPI handles and are kept
+REFERENCE_NUMBER = re.compile(r"(?<![\w@])(?:[a-z]{4,5}\d{8,}|\d{9,}[a-z]*)(?![\w@])")
+# ASCII characters SPECIAL_CHARS removes, for bytes.translate (much faster than the regex)
+SPECIAL_ASCII = bytes(code for code in range(128) if SPECIAL_CHARS.match(chr(code)))
+TABLE_WORKERS = int(os.getenv("BANK_TABLE_WORKERS", "1"))  # 1 = extract tables in this process
+PAGES_PER_TASK = 16
 
+# Header cell text with line breaks collapsed ("Value\nDate" -> "Value Date"); a known column
+# whose words came out glued ("ValueDate") gets its name back
+def normalize_header(cell):
+    if not cell:
+        return cell
+    return KNOWN_HEADERS.get(re.sub(r"\s+", "", cell).lower(), re.sub(r"\s+", " ", cell).strip())
+
+# Turn one page's raw table rows into a typed DataFrame batch.
+# Header rows repeated on every page and non-transaction rows (e.g. "Total") are dropped.
+def to_typed_batch(rows, columns):
+    width = len(columns)
+    rows = [list(row[:width]) + [None] * (width - len(row)) for row in rows]
+    df = pd.DataFrame(rows, columns=columns)
+    df = df.loc[:, [c for c in columns if c]]  # Unnamed (empty header) columns
+    df = df.dropna(how='all')
+    dates = pd.to_datetime(df["Post Date"], format="%d/%m/%Y", errors="coerce")
+    df = df[dates.notna()].copy()
+    df["Post Date"] = dates[dates.notna()]
+    if "Value Date" in df:
+        df["Value Date"] = pd.to_datetime(df["Value Date"], format="%d/%m/%Y", errors="coerce")
+    for column in ("DR", "CR"):
+        if column in df:
+            df[column] = pd.to_numeric(df[column].str.replace(",", "", regex=False), errors="coerce")
+    return df.reset_index(drop=True)
+
+# Raw table rows of one page: (header row or None, data rows)
+# Known layouts are parsed from word positions; otherwise pdfplumber detects the tables
+def extract_page_rows(page):
+    header, rows = None, []
+    words = page.extract_words() if statement_template.ENABLED else None
+    template = statement_template.find_template(page, words) if words else None
+    if template is not None:
+        rows = template.parse_page(page, words)
+        if rows is not None:
+            statement_template.record_page(fast=True)
+            page.flush_cache()
+            return template.header, rows
+        rows = []
+
+    for table in page.find_tables():  # Detect tables on each page
+        for n, row in enumerate(table.extract()):
+            if row and normalize_header(row[0]) == "Post Date":
+                header = [normalize_header(cell) for cell in row]  # Repeated on every page
+                if n == 0 and words and template is None:
+                    template = statement_template.remember(page, table, header, words)
+                continue
+            rows.append(row)
+    statement_template.record_page(fast=False)
+    page.flush_cache()  # Release the page's parsed objects before moving on
+    return header, rows
+
+# Worker task: open the PDF in this process and extract the given pages
+def _extract_page_range(task):
+    path, numbers = task
+    with pdfplumber.open(path) as pdf:
+        return [extract_page_rows(pdf.pages[n]) for n in numbers]
+
+# Path worker processes open the PDF from: its own path, or an upload written once to a
+# temporary file (removed afterwards), so tasks carry a path instead of the whole document
+@contextmanager
+def _task_path(pdf_path):
+    if isinstance(pdf_path, (str, os.PathLike)):
+        yield os.fspath(pdf_path)
+        return
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+        f.write(pdf_path.getbuffer() if hasattr(pdf_path, "getbuffer") else pdf_path.read())
+    try:
+        yield f.name
+    finally:
+        os.remove(f.name)
+
+# (page number, raw rows) for the pages (all when None), extracted by worker processes over
+# runs of PAGES_PER_TASK pages (in page order)
+def _iter_rows_parallel(pdf_path, workers, pages=None):
+    with _task_path(pdf_path) as path:
+        if pages is None:
+            with pdfplumber.open(path) as pdf:
+                pages = range(len(pdf.pages))
+        pages = list(pages)
+        tasks = [(path, pages[start:start + PAGES_PER_TASK]) for start in range(0, len(pages), PAGES_PER_TASK)]
+        done = 0
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for (_, numbers), rows in zip(tasks, pool.map(_extract_page_range, tasks)):  # In submission order
+                for n, page in zip(numbers, rows):
+                    done += 1
+                    progress.report(done, len(pages))
+                    yield n, page
+
+def _iter_rows(pdf_path, pages=None):
     with pdfplumber.open(pdf_path) as pdf:
-        for page in pdf.pages:
-            tables = page.extract_tables()  # Extract tables from each page
-            for table in tables:
-                for row in table:  # Extract row from each table
-                    transactions.append(row)  # Append each extracted row in the list
+        pages = range(len(pdf.pages)) if pages is None else list(pages)
+        for done, n in enumerate(pages, start=1):
+            rows = extract_page_rows(pdf.pages[n])
+            progress.report(done, len(pages))
+            yield n, rows
 
-    # Convert extracted data into a DataFrame
-    df = pd.DataFrame(transactions)
+# Generator: (page number, typed DataFrame or None when the page has no transactions) for the
+# given page numbers (default all), so only one page is held at a time
+# pdf_path may also be raw bytes or an uploaded file object
+# workers > 1 extracts page ranges in parallel processes (pages still come out in order)
+def iter_numbered_pages(pdf_path, workers=None, pages=None):
+    workers = workers or TABLE_WORKERS
+    if isinstance(pdf_path, (bytes, bytearray, memoryview)):
+        pdf_path = BytesIO(pdf_path)
+    numbered = _iter_rows_parallel(pdf_path, workers, pages) if workers > 1 else _iter_rows(pdf_path, pages)
+    columns = STATEMENT_COLUMNS
+    for n, (header, rows) in numbered:
+        if header is not None:
+            columns = header  # Header row names the columns; later repeats are dropped
+        batch = to_typed_batch(rows, columns) if rows else None
+        yield n, batch if batch is not None and not batch.empty else None
 
-    # Remove all rows and columns having all values NaN
-    df = df.dropna(how='all').dropna(axis=1, how='all')
+# Generator: yield one typed DataFrame per page with transactions
+def iter_statement_pages(pdf_path, workers=None):
+    for _, batch in iter_numbered_pages(pdf_path, workers):
+        if batch is not None:
+            yield batch
 
-    # Save DataFrame as CSV
-    df.to_csv(csv_path, index=False, header=False)
+# Function to extract all transactions from the PDF (optionally saved to a CSV)
+def extract_data_from_pdf(pdf_path, csv_path=None, workers=None):
+    batches = list(iter_statement_pages(pdf_path, workers))
+    df = pd.concat(batches, ignore_index=True) if batches else pd.DataFrame(columns=STATEMENT_COLUMNS)
+    if csv_path:
+        df.to_csv(csv_path, index=False)
     return df
 
 # Function to clean and standardize transaction descriptions
@@ -40,50 +170,70 @@ def clean_description(description):
     if pd.isna(description):  # If there are missing values
         return ""
     description = str(description).lower()  # Convert to lowercase
-    description = re.sub(r"[^a-zAZ0-9\s@]", "", description)  # Remove special characters except '@'
-    description = re.sub(r"\s+", " ", description).strip()  # Remove extra spaces
+    description = SPECIAL_CHARS.sub("", description)  # Remove special characters except '@'
+    description = WHITESPACE.sub(" ", description).strip()  # Remove extra spaces
     return description
 
-# Function to categorize the transaction descriptions
+# One description through the normalization steps (no missing values here). Same output as the
+# regex steps, with cheaper string methods: after the special characters go, words are separated
+# only by whitespace, so reference numbers are whole words and split/join collapses the spaces.
+def _normalize_one(description, strip_references):
+    text = description.lower().replace("~", " ")  # "TRANSFER ~ ~\n~ UPI" padding
+    if text.isascii():
+        text = text.encode("ascii").translate(None, SPECIAL_ASCII).decode("ascii")
+    else:
+        text = SPECIAL_CHARS.sub("", text)
+    words = text.split()
+    if strip_references:
+        words = [word for word in words if len(word) < 9 or not REFERENCE_NUMBER.fullmatch(word)]
+    return " ".join(words)
+
+# Column-wise version of clean_description for a whole Series of descriptions.
+# Each distinct description is normalized once and mapped back to its rows.
+# strip_references also drops UPI/IMPS/NEFT reference numbers, leaving the merchant text.
+def normalize_descriptions(descriptions, strip_references=True):
+    codes, distinct = pd.factorize(descriptions.fillna("").astype(str))
+    normalized = np.array([_normalize_one(text, strip_references) for text in distinct], dtype=object)
+    return pd.Series(normalized.take(codes), index=descriptions.index, name=descriptions.name)
+
+# Function to categorize one transaction description (rules from data/category_rules.json)
 def categorize_transaction(description):
-    category_mapping = {
-        "Food": ["swiggy", "zomato", "faasos", "ovenstory", "restaurant", "pizza", "mcdonald"],
-        "Transport": ["metro", "uber", "ola", "fuel", "petrol", "bus", "train", "olacabs"],
-        "Shopping": ["amazon", "flipkart", "myntra", "ebay", "paytm", "snapdeal"],
-        "Utilities": ["electricity", "water bill", "internet", "phone recharge", "vodafone", "jio", "billdesk"],
-        "Entertainment": ["netflix", "prime", "spotify", "hotstar", "movie"],
-        "Salary": ["salary", "payout", "income", "credit interest"],
-        "Health": ["pharmacy", "medical", "hospital", "larimedicals", "medicine", "doctor"],
-        "ATM Withdrawals": ["atm wdl", "cash withdrawal", "atm"],
-        "Bank_fees": ["sms charges", "account charges", "service fee", "penalty"],
-        "Peer To Peer": ["upi", "imps", "transfer", "to", "by", "neft", "rtgs"],
-        "Loan Payments": ["emi", "loan", "repayment"]
-    }
-
-    for category, keywords in category_mapping.items():
-        if any(keyword in description for keyword in keywords):
-            return category  # Assign the matched category
-    return "other"  # If no match is found
-
-# Function to clean data and categorize transactions
-def process_bank_statement(pdf_path, output_csv_path=r"C:\BFSI_OCR\data\Bank_transactions_categories.csv"):
-    # Extract data from PDF
-    df = extract_data_from_pdf(pdf_path, r"C:\BFSI_OCR\data\bank_transactions.csv")
-
-    # Load CSV file
-    df = pd.read_csv(r"C:\BFSI_OCR\data\bank_transactions.csv")
-
-    # Apply cleaning function to descriptions
-    df["Cleaned_Description"] = df["Description"].apply(clean_description)
-
-    # Apply categorization function
-    df["Category"] = df["Cleaned_Description"].apply(categorize_transaction)
-
-    # Save the corrected CSV
-    df.to_csv(output_csv_path, index=False)
+    return categorizer.get_categorizer().categorize_one(description)
 
+# Clean and categorize one batch of transactions
+def categorize_batch(df):
+    # Normalize the whole description column at once
+    df["Cleaned_Description"] = normalize_descriptions(df["Description"])
+
+    # Categorize the whole column at once
+    df["Category"] = categorizer.get_categorizer().categorize(df["Cleaned_Description"])
     return df
 
+# Sink that appends each batch to a CSV file (header written with the first batch)
+def csv_sink(csv_path):
+    state = {"header": True}
+
+    def write(batch):
+        batch.to_csv(csv_path, mode="w" if state["header"] else "a", header=state["header"], index=False)
+        state["header"] = False
+    return write
+
+# Generator: categorized batches page by page; sink (optional) persists each batch as it arrives
+def stream_bank_statement(pdf_path, sink=None, workers=None):
+    for batch in iter_statement_pages(pdf_path, workers):
+        batch = categorize_batch(batch)
+        if sink is not None:
+            sink(batch)
+        yield batch
+
+# Function to clean data and categorize transactions (output_csv_path=None skips saving)
+def process_bank_statement(pdf_path, output_csv_path=None, workers=None):
+    sink = csv_sink(output_csv_path) if output_csv_path else None
+    batches = list(stream_bank_statement(pdf_path, sink, workers))
+    if not batches:
+        return pd.DataFrame(columns=STATEMENT_COLUMNS + ["Cleaned_Description", "Category"])
+    return pd.concat(batches, ignore_index=True)
+
 # Function to visualize spending distribution by category
 def plot_category_spending(df):
 
@@ -113,36 +263,36 @@ def plot_category_spending(df):
     category_totals = category_totals[category_totals > 0]
 
    
-    # Plot the Pie Chart
-    plt.figure(figsize=(8, 8))
-    category_totals.plot(kind='pie', autopct='%1.1f%%', startangle=90, colors=colors)
-    plt.title("Spending Distribution Per Category (Pie Chart)",fontsize=16)
-    plt.ylabel("")  # To remove the y-axis label (default text)
-    plt.tight_layout()
+    # Plot the Pie Chart (own figures, not pyplot's global one: sessions draw concurrently)
+    fig, ax = charts.new_figure((8, 8))
+    category_totals.plot(kind='pie', autopct='%1.1f%%', startangle=90, colors=colors, ax=ax)
+    ax.set_title("Spending Distribution Per Category (Pie Chart)",fontsize=16)
+    ax.set_ylabel("")  # To remove the y-axis label (default text)
+    fig.tight_layout()
     
     # Use Streamlit to display the pie chart
-    st.pyplot(plt)
+    st.pyplot(fig)
 
     # Plot the Bar Graph
-    plt.figure(figsize=(12, 6)) 
-    category_totals.plot(kind='bar', color=colors, edgecolor='black')
-    plt.title("Total Spending by Category (Bar Graph)",fontsize=16)
-    plt.xlabel("Category")
-    plt.ylabel("Amount Spent")
-    plt.xticks(rotation=0)  # Set x-axis labels to be straight
-    plt.tight_layout()
+    fig, ax = charts.new_figure((12, 6))
+    category_totals.plot(kind='bar', color=colors, edgecolor='black', ax=ax)
+    ax.set_title("Total Spending by Category (Bar Graph)",fontsize=16)
+    ax.set_xlabel("Category")
+    ax.set_ylabel("Amount Spent")
+    charts.rotate_xticklabels(ax, 0)  # Set x-axis labels to be straight
+    fig.tight_layout()
     
     # Use Streamlit to display the bar chart
-    st.pyplot(plt)
+    st.pyplot(fig)
 
     # Plot the Scatter Plot for Spending by Category
-    plt.figure(figsize=(10, 6))
-    plt.scatter(category_totals.index, category_totals, color='#6B4423', s=100)  # 's' defines the size of the points
-    plt.title("Total Spending by Category (Scatter Plot)",fontsize=16)
-    plt.xlabel("Category")
-    plt.ylabel("Amount Spent")
-    plt.xticks(rotation=0)
-    plt.tight_layout()
+    fig, ax = charts.new_figure((10, 6))
+    ax.scatter(category_totals.index, category_totals, color='#6B4423', s=100)  # 's' defines the size of the points
+    ax.set_title("Total Spending by Category (Scatter Plot)",fontsize=16)
+    ax.set_xlabel("Category")
+    ax.set_ylabel("Amount Spent")
+    charts.rotate_xticklabels(ax, 0)
+    fig.tight_layout()
 
     # Use Streamlit to display the scatter plot
-    st.pyplot(plt)
+    st.pyplot(fig)
@@ -0,0 +1,31 @@
+"""
+Chart Helpers (safe to use from concurrent jobs)
+
+- Pipelines run on the job queue's threads, and pyplot keeps one global
+  "current figure" per process, so two jobs drawing at once draw into each
+  other's charts.
+- Charts are therefore built on their own matplotlib Figure (with its own
+  canvas) and never go through pyplot; st.pyplot and savefig take the figure.
+"""
+
+from io import BytesIO
+from typing import Tuple
+
+from matplotlib.figure import Figure
+
+# A new figure and its single axes
+def new_figure(figsize: Tuple[float, float]):
+    fig = Figure(figsize=figsize)
+    return fig, fig.subplots()
+
+# Rotate/align the x tick labels of an axes (pyplot's plt.xticks(rotation=...) for one axes)
+def rotate_xticklabels(ax, rotation: float, **text_properties):
+    for label in ax.get_xticklabels():
+        label.set(rotation=rotation, **text_properties)
+
+# PNG of the figure in a buffer positioned at its start
+def to_png(fig: Figure) -> BytesIO:
+    buf = BytesIO()
+    fig.savefig(buf, format="png")
+    buf.seek(0)
+    return buf
@@ -0,0 +1,104 @@
+"""
+Document OCR (images and multi-page PDFs)
+
+- Accepts paths, bytes, memoryviews or file-like uploads without temp files.
+- Decodes uploaded image bytes with OpenCV.
+- Rasterizes PDFs lazily, one page at a time, at a chosen DPI (pypdfium2).
+- OCRs PDF pages in parallel on the shared OCR engine, with only a bounded
+  number of rendered pages in memory at once.
+- Merges per-page OCRResults back in page order.
+- Optionally OCRs only a marked section of single images (two-pass mode).
+- Goes through the OCR cache, so repeat documents skip rendering and OCR.
+"""
+
+import os
+from collections import deque
+from typing import Callable, Iterator, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+import pypdfium2 as pdfium
+
+from supervised import ocr_cache, ocr_engine, progress, section_ocr
+from supervised.ocr_result import OCRResult
+
+PDF_DPI = int(os.getenv("PDF_DPI", "300"))
+BytesLike = Union[bytes, bytearray, memoryview]
+
+# Get the document bytes from a path, raw bytes or an upload/buffer.
+# Streamlit uploads are BytesIO objects, so getbuffer() gives a view without copying.
+def read_source(source) -> BytesLike:
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return source
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            return f.read()
+    if hasattr(source, "getbuffer"):
+        return source.getbuffer()
+    return source.read()
+
+# PDF files start with the %PDF magic bytes
+def is_pdf(data: BytesLike) -> bool:
+    return bytes(data[:5]) == b"%PDF-"
+
+# Decode image bytes into a BGR array (same layout as cv2.imread), no copy of the input
+def decode_image(data: BytesLike) -> np.ndarray:
+    img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        raise ValueError("Could not decode the uploaded image.")
+    return img
+
+# Yield each PDF page as a BGR array, rendering only when the page is requested
+def iter_pdf_pages(data: BytesLike, dpi: int = PDF_DPI) -> Iterator[np.ndarray]:
+    pdf = pdfium.PdfDocument(data if isinstance(data, bytes) else bytes(data))
+    try:
+        for index in range(len(pdf)):
+            page = pdf[index]
+            bitmap = page.render(scale=dpi / 72)
+            image = cv2.cvtColor(np.array(bitmap.to_pil().convert("RGB")), cv2.COLOR_RGB2BGR)
+            bitmap.close()
+            page.close()
+            yield image
+    finally:
+        pdf.close()
+
+def pdf_page_count(data: BytesLike) -> int:
+    pdf = pdfium.PdfDocument(data if isinstance(data, bytes) else bytes(data))
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+# OCR every page of a PDF in parallel; at most max_in_flight pages are held in memory
+def ocr_pdf_pages(data: BytesLike, preprocess: Callable[[np.ndarray], np.ndarray], config: str,
+                  dpi: int = PDF_DPI, max_in_flight: Optional[int] = None) -> OCRResult:
+    max_in_flight = max_in_flight or ocr_engine.get_engine().max_workers
+    total = pdf_page_count(data)
+    in_flight = deque()
+    pages = []
+    for image in iter_pdf_pages(data, dpi):
+        in_flight.append(ocr_engine.submit(preprocess(image), config, with_boxes=True))
+        if len(in_flight) >= max_in_flight:
+            pages.append(in_flight.popleft().result())  # Oldest first keeps page order
+            progress.report(len(pages), total)
+    while in_flight:
+        pages.append(in_flight.popleft().result())
+        progress.report(len(pages), total)
+    return OCRResult.concat(pages)  # Page numbers follow the PDF order
+
+# OCR an image or PDF given its bytes; preprocess maps a BGR page to the OCR input.
+# section=(start_marker, end_marker) OCRs only that part of a single image;
+# PDFs are always read in full since the section may sit on any page.
+def ocr_document(data: BytesLike, variant: str, config: str,
+                 preprocess: Callable[[np.ndarray], np.ndarray], dpi: int = PDF_DPI,
+                 section: Optional[Tuple[str, str]] = None) -> OCRResult:
+    if is_pdf(data):
+        return ocr_cache.cached(data, f"{variant}@pdf{dpi}", config,
+                                lambda: ocr_pdf_pages(data, preprocess, config, dpi))
+    if section is not None:
+        start_marker, end_marker = section
+        return ocr_cache.cached(data, f"{variant}#{start_marker}..{end_marker}", config,
+                                lambda: section_ocr.ocr_section(preprocess(decode_image(data)),
+                                                                start_marker, end_marker, config))
+    return ocr_cache.cached(data, variant, config,
+                            lambda: ocr_engine.image_to_data(preprocess(decode_image(data)), config))
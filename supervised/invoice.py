@@ -2,7 +2,10 @@
 Invoice Data Extraction & Visualization
 
 Features:
-- Extracts invoice details (Description, Qty, Price, Total) using OCR.
+- Extracts invoice details (Description, Qty, Price, Total) using OCR word positions.
+- Line items end at the totals/footer (Subtotal, Total, Tax, Payment...), and
+  a row is only kept when its Qty, Price and Total are numbers, so footer
+  lines such as account and phone numbers are not stored as items.
 - Cleans and structures extracted data into a DataFrame.
 - Generates visualizations:
   - Bar Chart: Displays total price per item.
@@ -11,43 +14,94 @@ Features:
 """
 
 import pandas as pd
-import pytesseract
-import cv2
 import numpy as np
-import matplotlib.pyplot as plt
 import os
-import platform
+import re
 import sys
+from supervised import adaptive_ocr, charts, document_ocr, near_duplicate, preprocessing
+from supervised.ocr_result import OCRResult
+from storage import output_store
 
-# pytesseract.pytesseract.tesseract_cmd = r"C:\\Tesseract-OCR\\tesseract.exe"
-
-# Set Tesseract path dynamically based on the OS
-if platform.system() == 'Windows':
-    pytesseract.pytesseract.tesseract_cmd = r'C:\\Tesseract-OCR\\tesseract.exe'
-else:
-    # For Linux/Streamlit Cloud environment
-    pytesseract.pytesseract.tesseract_cmd = '/usr/bin/tesseract'
-
-def extract_invoice_data(image_path):
-    img = cv2.imread(image_path)
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    data = pytesseract.image_to_string(gray)
-    # Extract relevant lines 
-    lines = [line.strip() for line in data.split('\n') if line.strip()]
-    
-    # Parse invoice details
-    extracted_data = []
-    for line in lines:
-        parts = line.split()
-        if len(parts) >= 4:  # Ensure line has required columns
-            description = " ".join(parts[:-3])  # Merge words for description
-            if description.strip().upper() == "GRAND":  # Check if description is "GRAND"
-                 continue  # Skip this row
-            qty = parts[-3]
-            price = parts[-2]
-            total = parts[-1]
-            extracted_data.append([description, qty, price, total])
-    
+# Shared OCR preprocessing (BGR array, one page for PDFs)
+def preprocess_image(img):
+    return preprocessing.prepare_for_ocr(img)
+
+# image_source: path, bytes/memoryview or an uploaded file object (read in memory)
+# adaptive: escalate to heavier preprocessing when confidence is low or no line item parses
+def extract_invoice_data(image_source, adaptive=True):
+    image_bytes = document_ocr.read_source(image_source)
+    # Tesseract defaults (no --psm); images or multi-page PDFs, cached by content
+    if adaptive:
+        _, df, _ = adaptive_ocr.adaptive_ocr(image_bytes, "invoice", '', preprocess_image,
+                                             parse_invoice, has_line_items)
+        return df
+    ocr_result = document_ocr.ocr_document(image_bytes, "invoice-norm", '', preprocess_image)
+    return parse_invoice(ocr_result)
+
+# Extract invoice rows unless a near-identical invoice was already processed;
+# returns (DataFrame, near-duplicate info or None)
+def extract_invoice_deduplicated(image_source):
+    image_bytes = document_ocr.read_source(image_source)
+    return near_duplicate.deduplicate("invoice", image_bytes, lambda: extract_invoice_data(image_bytes),
+                                      encode=lambda df: df.to_dict(orient="records"),
+                                      decode=lambda rows: pd.DataFrame(rows, columns=["Description", "Qty", "Price", "Total"]))
+
+# At least one row with a numeric total
+def has_line_items(df):
+    return pd.to_numeric(df["Total"], errors='coerce').notna().any()
+
+# Column boundaries (x) between Description | Qty | Price | Total from the header line
+def find_columns(ocr_result: OCRResult, idx):
+    upper = [w.upper().strip(":") for w in ocr_result.words[idx]]
+    if not all(name in upper for name in ("QTY", "PRICE", "TOTAL")):
+        return None
+    header = [idx[upper.index(name)] for name in ("QTY", "PRICE", "TOTAL")]
+    left = ocr_result.left[header]
+    centres = left + ocr_result.width[header] // 2
+    # Description ends a little before the Qty header; numbers may be centred or right-aligned
+    return np.array([left[0] - ocr_result.width[header[0]], (centres[0] + centres[1]) // 2,
+                     (centres[1] + centres[2]) // 2])
+
+# First words of the lines that end the line items (totals, then payment/footer details)
+END_OF_ITEMS = {"SUBTOTAL", "SUB-TOTAL", "SUB", "TOTAL", "GRAND", "TAX", "VAT", "GST", "DISCOUNT",
+                "AMOUNT", "BALANCE", "PAYMENT"}
+NUMBER = re.compile(r"\d+(?:\.\d+)?")
+
+# Numeric cell text without currency symbols, separators or spaces ("$ 1,000" -> "1000")
+def clean_amount(text):
+    return text.replace("$", "").replace(",", "").replace(" ", "")
+
+# Qty, Price and Total cells all numbers once cleaned
+def is_item(amounts):
+    return all(NUMBER.fullmatch(amount) for amount in amounts)
+
+# Parse invoice rows (Description, Qty, Price, Total) from the OCR word positions
+def parse_invoice(ocr_result: OCRResult):
+    positional_rows, fallback_rows = [], []
+    columns = None
+    for idx in ocr_result.line_indices():
+        words = ocr_result.words[idx]
+        header = find_columns(ocr_result, idx)
+        if header is not None:
+            columns = header  # Rows below are split by the header's x positions
+            continue
+        if len(words) and words[0].upper().strip(":") in END_OF_ITEMS and (positional_rows or fallback_rows):
+            break  # Totals and footer follow the line items
+        if columns is not None:
+            centres = ocr_result.left[idx] + ocr_result.width[idx] // 2
+            cells = np.searchsorted(columns, centres, side="right")
+            row = [" ".join(words[cells == col]) for col in range(4)]
+            amounts = [clean_amount(cell) for cell in row[1:]]
+            if row[0] and is_item(amounts):
+                positional_rows.append([row[0]] + amounts)
+        else:
+            # Without a header the last three tokens are Qty, Price, Total (lone "$" dropped)
+            tokens = [word for word in words if clean_amount(word)]
+            if len(tokens) >= 4 and is_item([clean_amount(token) for token in tokens[-3:]]):
+                fallback_rows.append([" ".join(tokens[:-3])] + [clean_amount(token) for token in tokens[-3:]])
+
+    # Header-aligned rows when the table header was found, otherwise the token split
+    extracted_data = positional_rows if columns is not None else fallback_rows
     # Convert to DataFrame
     df = pd.DataFrame(extracted_data, columns=["Description", "Qty", "Price", "Total"])
     return df
@@ -72,41 +126,44 @@ def generate_visualizations(df):
         print("No valid data to visualize.")
         return None, None, None  
 
-    # Bar Chart
-    fig_bar, ax_bar = plt.subplots(figsize=(8, 5))
+    # Bar Chart (own figures, not pyplot's global one: jobs draw concurrently)
+    fig_bar, ax_bar = charts.new_figure((8, 5))
     ax_bar.bar(df["Description"], df["Total"], color=colors[:len(df)]) 
-    plt.xticks(rotation=0, ha='right')
-    plt.ylabel("Total Price")
-    plt.title("Invoice (Bar Chart)",fontsize=16)
-    plt.tight_layout()
+    charts.rotate_xticklabels(ax_bar, 0, ha='right')
+    ax_bar.set_ylabel("Total Price")
+    ax_bar.set_title("Invoice (Bar Chart)",fontsize=16)
+    fig_bar.tight_layout()
     
     # Line Chart
-    fig_line, ax_line = plt.subplots(figsize=(8, 5))
+    fig_line, ax_line = charts.new_figure((8, 5))
     ax_line.plot(df["Description"], df["Total"], marker='o', linestyle='-', color='#598C75')
-    plt.xticks(rotation=0, ha='right')
-    plt.ylabel("Total Price")
-    plt.title("Invoice (Line Chart)",fontsize=16)
-    plt.tight_layout()
+    charts.rotate_xticklabels(ax_line, 0, ha='right')
+    ax_line.set_ylabel("Total Price")
+    ax_line.set_title("Invoice (Line Chart)",fontsize=16)
+    fig_line.tight_layout()
     
     # Pie Chart
-    fig_pie, ax_pie = plt.subplots(figsize=(8, 8))
+    fig_pie, ax_pie = charts.new_figure((8, 8))
     if df["Total"].sum() > 0:
         ax_pie.pie(df["Total"], labels=df["Description"], autopct='%1.1f%%',
                    colors=colors)
-        plt.title("Invoice (Pie Chart)",fontsize=16)
-        plt.tight_layout()
+        ax_pie.set_title("Invoice (Pie Chart)",fontsize=16)
+        fig_pie.tight_layout()
     else:
         fig_pie = None
     
     return fig_bar, fig_line, fig_pie
 
 
-def process_invoice(image_path):
-    # Extract data from invoice
-    df = extract_invoice_data(image_path)
-    # Save extracted data as CSV
-    df.to_csv(r'C:\BFSI_OCR\data\invoice_data.csv', index=False)
+# duplicate_of is None, or {"document_id", "distance"} when a near-duplicate's result was reused
+def process_invoice(image_source):
+    # Extract data from invoice (or reuse the result of a near-identical one)
+    image_bytes = document_ocr.read_source(image_source)
+    df, duplicate_of = extract_invoice_deduplicated(image_bytes)
+    # Append extracted data to the invoice dataset of the output store (a near-duplicate's rows already are)
+    if duplicate_of is None:
+        output_store.append("invoice", df, document_id=output_store.document_key(image_bytes))
     # Generate visualizations
     bar_chart, line_chart, pie_chart = generate_visualizations(df)
     
-    return df, bar_chart, line_chart, pie_chart
+    return df, bar_chart, line_chart, pie_chart, duplicate_of
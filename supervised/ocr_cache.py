@@ -0,0 +1,179 @@
+"""
+Content-Addressed OCR Cache
+
+- Keys each OCR result on a SHA-256 of the image bytes, the preprocessing
+  variant and the Tesseract config string.
+- Stores the OCR result (words, boxes, ids, confidences) as small JSON files on disk.
+- Caps the total cache size and evicts least recently used entries
+  (a hit refreshes the file's mtime).
+- An entry that cannot be read back (corrupt JSON, older layout) counts as
+  a miss and is deleted; overwriting a key replaces its size in the total.
+- Exposes hit/miss/eviction counters; a repeat document skips both
+  preprocessing and OCR.
+"""
+
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from supervised.ocr_result import OCRResult
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE_DIR = os.getenv("OCR_CACHE_DIR", os.path.join(current_dir, "..", "data", "ocr_cache"))
+DEFAULT_MAX_BYTES = int(os.getenv("OCR_CACHE_MAX_MB", "512")) * 1024 * 1024
+CACHE_FORMAT = b"ocr-result-v2"  # Bump when the stored layout changes
+
+
+class OCRCache:
+    """On-disk LRU cache of OCR results keyed by document content."""
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._size = sum(entry.stat().st_size for entry in self._entries())
+
+    # Hash of image bytes + preprocessing variant + Tesseract config
+    @staticmethod
+    def make_key(image_bytes, variant: str, config: str) -> str:
+        digest = hashlib.sha256(CACHE_FORMAT)
+        digest.update(variant.encode())
+        digest.update(b"\0")
+        digest.update(config.encode())
+        digest.update(b"\0")
+        digest.update(image_bytes)
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key + ".json")
+
+    def _entries(self):
+        for sub in os.scandir(self.cache_dir):
+            if sub.is_dir():
+                yield from (e for e in os.scandir(sub.path) if e.name.endswith(".json"))
+
+    # Look up a cached result, passed through decode (None from decode = unusable entry);
+    # a hit bumps the entry to most recently used, an unusable entry is a miss and is deleted
+    def get(self, key: str, decode: Callable[[Dict[str, list]], Any] = lambda stored: stored) -> Any:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                result = decode(json.load(f))
+        except FileNotFoundError:
+            result = None
+        except (ValueError, KeyError, TypeError):  # Corrupt JSON (ValueError) or unexpected layout
+            result = None
+            self._discard(path)
+        else:
+            if result is None:
+                self._discard(path)
+        with self._lock:
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if result is not None:
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                pass  # Evicted by another process meanwhile
+        return result
+
+    # Delete an entry and take its size off the total
+    def _discard(self, path: str):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except FileNotFoundError:
+            return
+        with self._lock:
+            self._size -= size
+
+    # Store a result atomically, then evict down to the size cap if needed
+    def put(self, key: str, result: Dict[str, list]):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(result, f)
+        size = os.path.getsize(tmp_path)
+        try:
+            replaced = os.path.getsize(path)  # Overwriting a key: its old size leaves the total
+        except FileNotFoundError:
+            replaced = 0
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._size += size - replaced
+            over_cap = self._size > self.max_bytes
+        if over_cap:
+            self._evict()
+
+    # Drop least recently used entries until the cache fits under max_bytes
+    def _evict(self):
+        entries = []
+        for entry in self._entries():
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue  # Removed by another process meanwhile
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        target = int(self.max_bytes * 0.9)  # Leave headroom so we don't evict on every put
+        evicted = 0
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            evicted += 1
+        with self._lock:
+            self._size = total
+            self.evictions += evicted
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "size_bytes": self._size,
+            }
+
+
+_cache: Optional[OCRCache] = None
+_cache_lock = threading.Lock()
+
+# Process-wide cache, created on first use
+def get_cache() -> OCRCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = OCRCache()
+        return _cache
+
+# Return the cached OCR result for these bytes, or compute it once and remember it
+def cached(image_bytes, variant: str, config: str,
+           compute: Callable[[], OCRResult]) -> OCRResult:
+    cache = get_cache()
+    key = cache.make_key(image_bytes, variant, config)
+    result = cache.get(key, OCRResult.from_dict)
+    if result is None:
+        result = compute()
+        cache.put(key, result.to_dict())
+    return result
+
+def stats() -> Dict[str, float]:
+    return get_cache().stats() if _cache is not None else {}
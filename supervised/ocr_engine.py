@@ -0,0 +1,200 @@
+"""
+Shared OCR Engine
+
+- Runs Tesseract in a bounded pool of long-lived worker processes.
+- Keeps a tesserocr handle warm in every worker when tesserocr is installed,
+  so traineddata is loaded once per worker instead of once per call.
+- Falls back to pytesseract inside the worker when tesserocr is missing.
+- Payslip, invoice and P&L extractors all submit their images here.
+- image_to_data returns an OCRResult (words, boxes, ids, confidences) from one pass.
+- Reports queue depth and per-job latency (queue wait + OCR time).
+"""
+
+import os
+import re
+import time
+import atexit
+import platform
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, Optional
+
+import numpy as np
+import pytesseract
+from PIL import Image
+
+from supervised.ocr_result import OCRResult
+
+try:
+    import tesserocr  # Optional: in-process Tesseract API, much cheaper per call
+except ImportError:
+    tesserocr = None
+
+# Set Tesseract path dynamically based on the OS
+if platform.system() == 'Windows':
+    TESSERACT_CMD = r'C:\\Tesseract-OCR\\tesseract.exe'
+else:
+    # For Linux/Streamlit Cloud environment
+    TESSERACT_CMD = '/usr/bin/tesseract'
+pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
+
+DEFAULT_CONFIG = r'--oem 3 --psm 6'
+DEFAULT_WORKERS = int(os.getenv("OCR_WORKERS", max(1, (os.cpu_count() or 2) - 1)))
+LATENCY_WINDOW = 1000  # Number of recent jobs kept for latency stats
+
+# Tesserocr handles kept warm inside each worker process, keyed by (oem, psm)
+_worker_apis = {}
+
+# Runs once in every worker process
+def _init_worker(tesseract_cmd: str):
+    pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+
+# Read --oem / --psm values out of a Tesseract config string
+def _parse_modes(config: str):
+    oem = re.search(r'--oem\s+(\d+)', config)
+    psm = re.search(r'--psm\s+(\d+)', config)
+    return (int(oem.group(1)) if oem else 3, int(psm.group(1)) if psm else 3)
+
+# Get (or create once) the tesserocr handle for this worker
+def _get_api(config: str):
+    oem, psm = _parse_modes(config)
+    api = _worker_apis.get((oem, psm))
+    if api is None:
+        api = tesserocr.PyTessBaseAPI(lang='eng', oem=oem, psm=psm)
+        _worker_apis[(oem, psm)] = api
+    return api
+
+# OCR job executed inside a worker process
+def _ocr_job(image: np.ndarray, config: str):
+    start = time.perf_counter()
+    if tesserocr is not None:
+        api = _get_api(config)
+        api.SetImage(Image.fromarray(image))
+        text = api.GetUTF8Text()
+    else:
+        text = pytesseract.image_to_string(image, config=config)
+    return text, time.perf_counter() - start
+
+# OCR job returning text plus word boxes from a single recognition pass
+def _ocr_data_job(image: np.ndarray, config: str):
+    start = time.perf_counter()
+    if tesserocr is not None:
+        api = _get_api(config)
+        api.SetImage(Image.fromarray(image))
+        tsv = api.GetTSVText(0)
+    else:
+        tsv = pytesseract.image_to_data(image, config=config)
+    result = OCRResult.from_tsv(tsv)
+    return result, time.perf_counter() - start
+
+
+class OCREngine:
+    """Bounded pool of warm OCR workers with queue/latency accounting."""
+
+    def __init__(self, max_workers: int = DEFAULT_WORKERS):
+        self.max_workers = max_workers
+        self._executor = ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_init_worker,
+            initargs=(TESSERACT_CMD,),
+        )
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._completed = 0
+        self._failed = 0
+        self._latencies = deque(maxlen=LATENCY_WINDOW)  # submit -> result, seconds
+        self._ocr_times = deque(maxlen=LATENCY_WINDOW)  # time spent inside Tesseract
+
+    # Submit an image and get a Future resolving to the OCR text
+    # (or to an OCRResult when with_boxes is set)
+    def submit(self, image: np.ndarray, config: str = DEFAULT_CONFIG, with_boxes: bool = False) -> Future:
+        submitted_at = time.perf_counter()
+        with self._lock:
+            self._pending += 1
+        job = _ocr_data_job if with_boxes else _ocr_job
+        inner = self._executor.submit(job, image, config)
+        outer = Future()
+
+        def _done(fut):
+            with self._lock:
+                self._pending -= 1
+                if fut.exception() is not None:
+                    self._failed += 1
+                else:
+                    self._completed += 1
+                    self._latencies.append(time.perf_counter() - submitted_at)
+                    self._ocr_times.append(fut.result()[1])
+            if fut.exception() is not None:
+                outer.set_exception(fut.exception())
+            else:
+                outer.set_result(fut.result()[0])
+
+        inner.add_done_callback(_done)
+        return outer
+
+    # Blocking convenience wrapper around submit()
+    def image_to_string(self, image: np.ndarray, config: str = DEFAULT_CONFIG) -> str:
+        return self.submit(image, config).result()
+
+    # Blocking: words, boxes, ids and confidences from a single pass
+    def image_to_data(self, image: np.ndarray, config: str = DEFAULT_CONFIG) -> OCRResult:
+        return self.submit(image, config, with_boxes=True).result()
+
+    # Snapshot of queue depth and latency percentiles (milliseconds)
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            latencies = np.array(self._latencies)
+            ocr_times = np.array(self._ocr_times)
+            pending = self._pending
+            completed = self._completed
+            failed = self._failed
+
+        def _ms(values, q):
+            return float(np.percentile(values, q) * 1000) if len(values) else 0.0
+
+        return {
+            "workers": self.max_workers,
+            "in_flight": pending,
+            "queue_depth": max(0, pending - self.max_workers),
+            "completed": completed,
+            "failed": failed,
+            "latency_p50_ms": _ms(latencies, 50),
+            "latency_p95_ms": _ms(latencies, 95),
+            "ocr_p50_ms": _ms(ocr_times, 50),
+            "ocr_p95_ms": _ms(ocr_times, 95),
+        }
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+
+_engine: Optional[OCREngine] = None
+_engine_lock = threading.Lock()
+
+# Set the pool size before the engine is first used (e.g. 1 per batch worker)
+def configure(max_workers: int):
+    global DEFAULT_WORKERS
+    DEFAULT_WORKERS = max_workers
+
+# Process-wide engine, created on first use
+def get_engine() -> OCREngine:
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = OCREngine(DEFAULT_WORKERS)
+            atexit.register(_engine.shutdown, False)
+        return _engine
+
+# Module-level shortcuts used by the extractors
+def submit(image: np.ndarray, config: str = DEFAULT_CONFIG, with_boxes: bool = False) -> Future:
+    return get_engine().submit(image, config, with_boxes)
+
+def image_to_string(image: np.ndarray, config: str = DEFAULT_CONFIG) -> str:
+    return get_engine().image_to_string(image, config)
+
+def image_to_data(image: np.ndarray, config: str = DEFAULT_CONFIG) -> OCRResult:
+    return get_engine().image_to_data(image, config)
+
+def stats() -> Dict[str, float]:
+    return get_engine().stats() if _engine is not None else {}
@@ -0,0 +1,114 @@
+"""
+OCR Result (single image_to_data pass)
+
+- Holds every recognized word with its box, confidence and page/block/paragraph/line ids.
+- Stored column-wise in numpy arrays (one array per field, not a list of dicts).
+- Text view: lines in reading order, or the joined text.
+- Positional view: per-line word indices, region selection, column positions.
+- Round-trips through plain dicts for the on-disk OCR cache.
+"""
+
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+INT_FIELDS = ("left", "top", "width", "height", "page", "block", "par", "line")
+LINE_KEY = ("page", "block", "par", "line")
+
+
+class OCRResult:
+    """Column-oriented word table produced by one Tesseract pass."""
+
+    __slots__ = ("words", "conf") + INT_FIELDS
+
+    def __init__(self, words, conf, left, top, width, height, page, block, par, line):
+        self.words = np.asarray(words, dtype=str)
+        self.conf = np.asarray(conf, dtype=np.float32)
+        self.left = np.asarray(left, dtype=np.int32)
+        self.top = np.asarray(top, dtype=np.int32)
+        self.width = np.asarray(width, dtype=np.int32)
+        self.height = np.asarray(height, dtype=np.int32)
+        self.page = np.asarray(page, dtype=np.int32)
+        self.block = np.asarray(block, dtype=np.int32)
+        self.par = np.asarray(par, dtype=np.int32)
+        self.line = np.asarray(line, dtype=np.int32)
+
+    # Parse Tesseract TSV (image_to_data) output; only word-level rows carry text
+    @classmethod
+    def from_tsv(cls, tsv: str) -> "OCRResult":
+        columns = {name: [] for name in ("words", "conf") + INT_FIELDS}
+        for row in tsv.splitlines():
+            cols = row.split('\t')
+            if len(cols) < 12 or cols[0] != '5' or not cols[11].strip():
+                continue
+            columns["page"].append(int(cols[1]))
+            columns["block"].append(int(cols[2]))
+            columns["par"].append(int(cols[3]))
+            columns["line"].append(int(cols[4]))
+            columns["left"].append(int(cols[6]))
+            columns["top"].append(int(cols[7]))
+            columns["width"].append(int(cols[8]))
+            columns["height"].append(int(cols[9]))
+            columns["conf"].append(float(cols[10]))
+            columns["words"].append(cols[11])
+        return cls(**columns)
+
+    @classmethod
+    def empty(cls) -> "OCRResult":
+        return cls([], [], *([[]] * len(INT_FIELDS)))
+
+    # Join per-page results, numbering pages 1..n in the given order
+    @classmethod
+    def concat(cls, results: Iterable["OCRResult"], renumber_pages: bool = True) -> "OCRResult":
+        results = list(results)
+        if not results:
+            return cls.empty()
+        fields = {name: np.concatenate([getattr(r, name) for r in results]) for name in cls.__slots__}
+        if renumber_pages:
+            fields["page"] = np.concatenate([np.full(len(r), n, dtype=np.int32)
+                                             for n, r in enumerate(results, start=1)])
+        return cls(**fields)
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    # Subset of words selected by a boolean mask or index array
+    def select(self, index) -> "OCRResult":
+        return OCRResult(**{name: getattr(self, name)[index] for name in self.__slots__})
+
+    # Words whose box centre falls inside the rectangle
+    def within(self, x0: int, y0: int, x1: int, y1: int) -> "OCRResult":
+        cx = self.left + self.width // 2
+        cy = self.top + self.height // 2
+        return self.select((cx >= x0) & (cx < x1) & (cy >= y0) & (cy < y1))
+
+    # Positional view: one index array per text line, in reading order
+    def line_indices(self) -> List[np.ndarray]:
+        if not len(self):
+            return []
+        keys = np.stack([getattr(self, name) for name in LINE_KEY], axis=1)
+        starts = np.flatnonzero(np.r_[True, (keys[1:] != keys[:-1]).any(axis=1)])
+        return np.split(np.arange(len(self)), starts[1:])
+
+    # Text view: one string per line
+    def lines(self) -> List[str]:
+        return [" ".join(self.words[idx]) for idx in self.line_indices()]
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.lines())
+
+    def mean_confidence(self) -> float:
+        valid = self.conf[self.conf >= 0]
+        return float(valid.mean()) if len(valid) else 0.0
+
+    # Plain dict of lists (JSON friendly) for the OCR cache
+    def to_dict(self) -> Dict[str, list]:
+        return {name: getattr(self, name).tolist() for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, list]) -> Optional["OCRResult"]:
+        try:
+            return cls(**{name: data[name] for name in cls.__slots__})
+        except (KeyError, TypeError):
+            return None  # Entry written in an older format
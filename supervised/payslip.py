@@ -1,38 +1,26 @@
 """
 Payslip Earnings Extraction & Visualization
 
-- Preprocesses image (grayscale, thresholding) for OCR.
+- Preprocesses image (grayscale, resolution normalization, deskew, thresholding) for OCR.
 - Extracts earnings categories and amounts using Tesseract OCR.
 - Cleans and structures extracted data.
 - Generates bar and pie charts for earnings distribution.
 - Stores visualizations in memory buffers for easy integration.
 """
 
-import os
-import pytesseract
-import cv2
 import numpy as np
 import re
-import matplotlib.pyplot as plt
-from typing import Dict
+from typing import Dict, Optional, Tuple
 from io import BytesIO
 import pandas as pd
-import platform
+from supervised import adaptive_ocr, charts, document_ocr, near_duplicate, preprocessing
+from supervised.ocr_result import OCRResult
+from storage import output_store
 
-# pytesseract.pytesseract.tesseract_cmd = r'C:\\Tesseract-OCR\\tesseract.exe'
-
-if platform.system() == 'Windows':
-    pytesseract.pytesseract.tesseract_cmd = r'C:\\Tesseract-OCR\\tesseract.exe'
-else:
-    # For Linux/Streamlit Cloud environment
-    pytesseract.pytesseract.tesseract_cmd = '/usr/bin/tesseract'
-
-# Preprocess image for OCR
-def preprocess_image(image_path: str) -> np.ndarray:
-    img = cv2.imread(image_path)
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    _, threshold = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-    return threshold
+# Preprocess image (BGR array, one page for PDFs) for OCR:
+# resolution normalization, deskew, margin crop and Otsu thresholding
+def preprocess_image(img: np.ndarray) -> np.ndarray:
+    return preprocessing.prepare_for_ocr(img)
 
 # Clean category text
 def clean_category(category: str) -> str:
@@ -41,11 +29,31 @@ def clean_category(category: str) -> str:
     return category.strip()
 
 #Extract earnings data from payslip image
-def extract_earnings(image_path: str) -> Dict[str, float]:
-    processed_img = preprocess_image(image_path)
+# two_pass: locate the Earnings..Deductions band at low resolution, then OCR only that band
+# adaptive: escalate to heavier preprocessing when confidence is low or no earnings parse
+# image_source: path, bytes/memoryview or an uploaded file object (read in memory)
+def extract_earnings(image_source, two_pass: bool = True, adaptive: bool = True) -> Dict[str, float]:
     custom_config = r'--oem 3 --psm 6'
-    text = pytesseract.image_to_string(processed_img, config=custom_config)
-    lines = text.split('\n')
+    image_bytes = document_ocr.read_source(image_source)
+    # Images or multi-page PDFs; repeat uploads are served from the OCR cache
+    section = ('Earnings', 'Deductions') if two_pass else None
+    if adaptive:
+        _, earnings, _ = adaptive_ocr.adaptive_ocr(image_bytes, "payslip", custom_config, preprocess_image,
+                                                   parse_earnings, bool, section=section)
+        return earnings
+    ocr_result = document_ocr.ocr_document(image_bytes, "payslip-norm", custom_config, preprocess_image,
+                                           section=section)
+    return parse_earnings(ocr_result)
+
+# Extract earnings unless a near-identical payslip (rescan/re-photo) was already processed;
+# returns (earnings, near-duplicate info or None)
+def extract_earnings_deduplicated(image_source) -> Tuple[Dict[str, float], Optional[Dict[str, int]]]:
+    image_bytes = document_ocr.read_source(image_source)
+    return near_duplicate.deduplicate("payslip", image_bytes, lambda: extract_earnings(image_bytes))
+
+# Parse earnings categories and amounts from the OCR lines
+def parse_earnings(ocr_result: OCRResult) -> Dict[str, float]:
+    lines = ocr_result.lines()
     earnings = {}
     flag = False
     earnings_keywords = {
@@ -80,20 +88,13 @@ def extract_earnings(image_path: str) -> Dict[str, float]:
 
     return earnings
 
-# Save earnings data to CSV
-def save_earnings_to_csv(earnings: Dict[str, float], folder_path: str = r"C:\BFSI_OCR\data"):
+# Save earnings data to the output store, keyed by the payslip's document id
+def save_earnings(earnings: Dict[str, float], document_id: Optional[str] = None):
     # Convert earnings dictionary to DataFrame
     df = pd.DataFrame(list(earnings.items()), columns=["Category", "Amount"])
-    
-    # Create the folder if it doesn't exist
-    if not os.path.exists(folder_path):
-        os.makedirs(folder_path)
 
-    # Define CSV file path
-    csv_file_path = os.path.join(folder_path, "payslip_data.csv")
-    
-    # Save the DataFrame to a CSV file
-    df.to_csv(csv_file_path, index=False)
+    # Append to the payslip dataset of the output store
+    output_store.append("payslip", df, document_id=document_id)
 
 #Visualize
 def visualize_earnings(earnings: Dict[str, float]) -> BytesIO:
@@ -113,36 +114,33 @@ def visualize_earnings(earnings: Dict[str, float]) -> BytesIO:
         '#8FC3B5'   # Celadon Green
     ]
 
-    # Bar Chart
-    plt.figure(figsize=(8, 6))
-    plt.bar(earnings.keys(), [earnings[key] for key in earnings], color=colors)
-    plt.xticks(rotation=45, ha='right', rotation_mode='anchor')
-    plt.xlabel('Categories')
-    plt.ylabel('Amount')
-    plt.title('Earnings Distribution',fontsize=16)
-    plt.tight_layout()
+    # Bar Chart (own figure, not pyplot's global one: jobs draw concurrently)
+    fig, ax = charts.new_figure((8, 6))
+    ax.bar(list(earnings.keys()), [earnings[key] for key in earnings], color=colors)
+    charts.rotate_xticklabels(ax, 45, ha='right', rotation_mode='anchor')
+    ax.set_xlabel('Categories')
+    ax.set_ylabel('Amount')
+    ax.set_title('Earnings Distribution',fontsize=16)
+    fig.tight_layout()
     # Save Bar Chart to a buffer
-    img_buf = BytesIO()
-    plt.savefig(img_buf, format='png')
-    img_buf.seek(0)
-    plt.close()
+    img_buf = charts.to_png(fig)
     
     # Pie Chart
-    plt.figure(figsize=(6, 6))
-    plt.pie(amounts, labels=categories, autopct='%1.1f%%', colors=colors, labeldistance=1.1, startangle=90)
-    plt.title('Earnings Distribution', loc='center',fontsize=16)
-    plt.tight_layout() 
-    # Save Pie Chart to the same buffer
-    img_buf_pie = BytesIO()
-    plt.savefig(img_buf_pie, format='png')
-    img_buf_pie.seek(0)
-    plt.close()
+    fig, ax = charts.new_figure((6, 6))
+    ax.pie(amounts, labels=categories, autopct='%1.1f%%', colors=colors, labeldistance=1.1, startangle=90)
+    ax.set_title('Earnings Distribution', loc='center',fontsize=16)
+    fig.tight_layout() 
+    # Save Pie Chart to its own buffer
+    img_buf_pie = charts.to_png(fig)
 
     return img_buf, img_buf_pie
 
 # Process the payslip
-def process_payslip(image_path: str):
-    earnings = extract_earnings(image_path)
-    save_earnings_to_csv(earnings)
+# duplicate_of is None, or {"document_id", "distance"} when a near-duplicate's result was reused
+def process_payslip(image_source):
+    image_bytes = document_ocr.read_source(image_source)
+    earnings, duplicate_of = extract_earnings_deduplicated(image_bytes)
+    if duplicate_of is None:  # A near-duplicate's earnings are already in the store
+        save_earnings(earnings, output_store.document_key(image_bytes))
     bar_chart, pie_chart = visualize_earnings(earnings)
-    return earnings, bar_chart, pie_chart
+    return earnings, bar_chart, pie_chart, duplicate_of
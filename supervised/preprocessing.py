@@ -0,0 +1,121 @@
+"""
+Shared OCR Preprocessing
+
+- Estimates the text height from connected components on a small proxy image.
+- Rescales the page so text lands at a Tesseract-friendly height
+  (big phone photos are shrunk, tiny scans are enlarged).
+- Deskews with a projection-profile search over small angles.
+- Crops empty margins around the printed content.
+- Finishes with Otsu thresholding (optional).
+- Heavier options for hard scans: larger text target, denoising and
+  adaptive (local) thresholding.
+"""
+
+import cv2
+import numpy as np
+from typing import Optional
+
+TARGET_TEXT_HEIGHT = 24     # Median glyph height (px) Tesseract reads best, roughly 300 DPI body text
+SCALE_TOLERANCE = (0.85, 1.2)  # Leave the image alone when already close to the target
+MIN_SCALE, MAX_SCALE = 0.2, 3.0
+PROXY_WIDTH = 1000          # Width of the downsampled copy used for estimates
+MAX_SKEW_DEGREES = 5.0
+
+# Convert any input (BGR, BGRA or gray) to single-channel gray
+def to_gray(img: np.ndarray) -> np.ndarray:
+    if img.ndim == 2:
+        return img
+    if img.shape[2] == 4:
+        return cv2.cvtColor(img, cv2.COLOR_BGRA2GRAY)
+    return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+# Small copy of the page plus the factor back to full resolution
+def _proxy(gray: np.ndarray):
+    factor = min(1.0, PROXY_WIDTH / gray.shape[1])
+    if factor == 1.0:
+        return gray, 1.0
+    small = cv2.resize(gray, None, fx=factor, fy=factor, interpolation=cv2.INTER_AREA)
+    return small, factor
+
+# Dark-on-light ink mask (text = 255)
+def _ink_mask(gray: np.ndarray) -> np.ndarray:
+    _, mask = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    return mask
+
+# Median height (full-resolution px) of glyph-sized connected components
+def estimate_text_height(gray: np.ndarray) -> Optional[float]:
+    small, factor = _proxy(gray)
+    mask = _ink_mask(small)
+    _, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    heights = stats[1:, cv2.CC_STAT_HEIGHT]
+    widths = stats[1:, cv2.CC_STAT_WIDTH]
+    areas = stats[1:, cv2.CC_STAT_AREA]
+    # Keep components shaped like characters: not specks, not rules or table borders
+    glyphs = (heights >= 3) & (heights <= small.shape[0] * 0.1) & (widths <= heights * 4) & (areas >= 6)
+    if glyphs.sum() < 20:
+        return None  # Not enough text to judge, leave resolution unchanged
+    return float(np.median(heights[glyphs])) / factor
+
+# Rescale so the median text height is close to target_height
+def normalize_resolution(gray: np.ndarray, target_height: float = TARGET_TEXT_HEIGHT) -> np.ndarray:
+    text_height = estimate_text_height(gray)
+    if not text_height:
+        return gray
+    scale = float(np.clip(target_height / text_height, MIN_SCALE, MAX_SCALE))
+    if SCALE_TOLERANCE[0] <= scale <= SCALE_TOLERANCE[1]:
+        return gray
+    interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_CUBIC
+    return cv2.resize(gray, None, fx=scale, fy=scale, interpolation=interpolation)
+
+# Skew angle (degrees) that makes text rows sharpest in the horizontal projection
+def estimate_skew(gray: np.ndarray, max_angle: float = MAX_SKEW_DEGREES, step: float = 0.5) -> float:
+    small, _ = _proxy(gray)
+    mask = _ink_mask(small)
+    h, w = mask.shape
+    center = (w / 2, h / 2)
+    best_angle, best_score = 0.0, -1.0
+    for angle in np.arange(-max_angle, max_angle + step / 2, step):
+        rotation = cv2.getRotationMatrix2D(center, angle, 1.0)
+        rotated = cv2.warpAffine(mask, rotation, (w, h), flags=cv2.INTER_NEAREST)
+        score = float(np.var(rotated.sum(axis=1, dtype=np.float64)))
+        if score > best_score:
+            best_angle, best_score = float(angle), score
+    return best_angle
+
+# Rotate the page upright; tiny angles are skipped to avoid resampling blur
+def deskew(gray: np.ndarray, min_angle: float = 0.3) -> np.ndarray:
+    angle = estimate_skew(gray)
+    if abs(angle) < min_angle:
+        return gray
+    h, w = gray.shape
+    rotation = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
+    return cv2.warpAffine(gray, rotation, (w, h), flags=cv2.INTER_LINEAR,
+                          borderMode=cv2.BORDER_CONSTANT, borderValue=255)
+
+# Crop to the bounding box of the printed content plus a small padding
+def crop_margins(gray: np.ndarray, padding: int = 10) -> np.ndarray:
+    mask = _ink_mask(gray)
+    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, np.ones((2, 2), np.uint8))  # Drop scanner specks
+    points = cv2.findNonZero(mask)
+    if points is None:
+        return gray
+    x, y, w, h = cv2.boundingRect(points)
+    y0, x0 = max(0, y - padding), max(0, x - padding)
+    return gray[y0:y + h + padding, x0:x + w + padding]
+
+# Full stage: gray -> resolution -> (denoise) -> deskew -> crop -> (Otsu or adaptive threshold)
+def prepare_for_ocr(img: np.ndarray, threshold: bool = True, target_height: float = TARGET_TEXT_HEIGHT,
+                    denoise: bool = False, adaptive: bool = False) -> np.ndarray:
+    gray = to_gray(img)
+    gray = normalize_resolution(gray, target_height)  # First, so the remaining steps run on fewer pixels
+    if denoise:
+        gray = cv2.fastNlMeansDenoising(gray, h=10)
+    gray = deskew(gray)
+    gray = crop_margins(gray)
+    if not threshold:
+        return gray
+    if adaptive:
+        # Local threshold copes with uneven lighting and shadows in phone photos
+        return cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 31, 15)
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return binary
@@ -8,47 +8,50 @@ Business Expense Extraction & Visualization
 """
 
 
-import pytesseract
-import cv2
 import pandas as pd
 import numpy as np
 import re
-import matplotlib.pyplot as plt
-from io import BytesIO  
-from PIL import Image
-from typing import Dict, Tuple  
-import os
-import platform
-
-# pytesseract.pytesseract.tesseract_cmd = r'C:\\Tesseract-OCR\\tesseract.exe'
-if platform.system() == 'Windows':
-    pytesseract.pytesseract.tesseract_cmd = r'C:\\Tesseract-OCR\\tesseract.exe'
-else:
-    # For Linux/Streamlit Cloud environment
-    pytesseract.pytesseract.tesseract_cmd = '/usr/bin/tesseract'
+from io import BytesIO
+from typing import Dict, Optional, Tuple
+from supervised import adaptive_ocr, charts, document_ocr, preprocessing
+from supervised.ocr_result import OCRResult
+from storage import output_store
 
 # Process the image
 def process_image(image_file) -> Tuple[Dict[str, float], BytesIO, BytesIO]:
-    # Read the uploaded image directly from the UploadedFile object
-    image = Image.open(image_file)  
-    ocr_text = perform_ocr(image)
-    data = extract_expenses(ocr_text)
+    # Read the UploadedFile buffer in memory (paths and bytes work too)
+    image_bytes = document_ocr.read_source(image_file)
+    ocr_result = perform_ocr(image_bytes)
+    data = extract_expenses(ocr_result)
+    document_id = output_store.document_key(image_bytes)
+    if not output_store.has_document("profit_loss", document_id):  # The same upload is stored once
+        save_expenses(data, document_id)
     # Create visualizations (return the chart to frontend)
     pie_chart, bar_chart = create_visualizations(data)
     return data, pie_chart, bar_chart
 
-# Perform OCR on the image
-def perform_ocr(image: Image.Image) -> str:
-    image = np.array(image)  # Convert the PIL image to a numpy array for OpenCV
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+# Shared OCR preprocessing (BGR array, one page for PDFs):
+# resolution normalization, deskew, margin crop and Otsu thresholding
+def preprocess_image(image: np.ndarray) -> np.ndarray:
+    return preprocessing.prepare_for_ocr(image)
+
+# Perform OCR on the image or PDF bytes (all pages, cached by content)
+# two_pass: OCR only the Allowable Business Expenses .. TOTAL BUSINESS EXPENSES band of images
+# adaptive: escalate to heavier preprocessing when confidence is low or no expense parses
+def perform_ocr(image_bytes, two_pass: bool = True, adaptive: bool = True) -> OCRResult:
     custom_config = r'--oem 3 --psm 6'
-    ocr_text = pytesseract.image_to_string(thresh, config=custom_config)
-    return ocr_text
+    section = ("Allowable Business Expenses", "TOTAL BUSINESS EXPENSES") if two_pass else None
+    if adaptive:
+        ocr_result, _, _ = adaptive_ocr.adaptive_ocr(image_bytes, "pnl", custom_config, preprocess_image,
+                                                     extract_expenses, lambda df: not df.empty, section=section)
+        return ocr_result
+    ocr_result = document_ocr.ocr_document(image_bytes, "pnl-norm", custom_config, preprocess_image,
+                                           section=section)
+    return ocr_result
 
-# Extract expenses from OCR text
-def extract_expenses(ocr_text: str) -> pd.DataFrame:
-    lines = ocr_text.split("\n")
+# Extract expenses from the OCR lines
+def extract_expenses(ocr_result: OCRResult) -> pd.DataFrame:
+    lines = ocr_result.lines()
     data = []
     flag = False
 
@@ -71,18 +74,13 @@ def extract_expenses(ocr_text: str) -> pd.DataFrame:
     df = pd.DataFrame(data, columns=["Allowable Business Expenses", "Amount"])
     df["Amount"] = pd.to_numeric(df["Amount"], errors="coerce")  # Convert 'Amount' column to numeric
     df = df.dropna()
-    
-     # Save DataFrame to a CSV file in a folder
-    folder_path = r"C:\BFSI_OCR\data"  
-    if not os.path.exists(folder_path):
-        os.makedirs(folder_path)  # Create folder if it doesn't exist
-    
-    csv_file_path = os.path.join(folder_path, "profit_loss_data.csv")  
-    df.to_csv(csv_file_path, index=False)  
-
-
     return df
 
+# Save expenses DataFrame to the output store, keyed by the document id
+def save_expenses(df: pd.DataFrame, document_id: Optional[str] = None):
+    # Append to the profit & loss dataset of the output store
+    output_store.append("profit_loss", df, document_id=document_id)
+
 # Create pie and bar charts and return them as image buffers
 def create_visualizations(df: pd.DataFrame) -> Tuple[BytesIO, BytesIO]:
     
@@ -95,27 +93,20 @@ def create_visualizations(df: pd.DataFrame) -> Tuple[BytesIO, BytesIO]:
         '#A47551',  # Light Brown
         '#C49A6C'   # Pale Brown
     ]
-    # Plot Pie Chart
-    pie_buf = BytesIO()
-    plt.figure(figsize=(8, 8))
-    plt.pie(df["Amount"], labels=df["Allowable Business Expenses"], autopct="%1.1f%%", startangle=140,colors=colors)
-    plt.title("Allowable Business Expenses",fontsize=16)
-    plt.savefig(pie_buf, format='png')
-    pie_buf.seek(0)# Reset buffer position to the beginning
-    plt.close()
+    # Plot Pie Chart (own figure, not pyplot's global one: jobs draw concurrently)
+    fig, ax = charts.new_figure((8, 8))
+    ax.pie(df["Amount"], labels=df["Allowable Business Expenses"], autopct="%1.1f%%", startangle=140,colors=colors)
+    ax.set_title("Allowable Business Expenses",fontsize=16)
+    pie_buf = charts.to_png(fig)
 
     # Plot Bar Chart
-    bar_buf = BytesIO()
-    plt.figure(figsize=(8, 6)) 
-    plt.bar(df["Allowable Business Expenses"], df["Amount"], color=colors[:len(df)])
-    plt.xticks(rotation=45, ha='right', rotation_mode='anchor')  
-    plt.tight_layout(pad=4.0)  
-    plt.xlabel("Expense Categories", labelpad=15) 
-    plt.ylabel("Amount ($)", labelpad=15)  
-    plt.title("Allowable Business Expenses",fontsize=16)
-    plt.savefig(bar_buf, format='png')
-    bar_buf.seek(0)  # Reset buffer position to the beginning
-
-    plt.close()  
+    fig, ax = charts.new_figure((8, 6))
+    ax.bar(df["Allowable Business Expenses"], df["Amount"], color=colors[:len(df)])
+    charts.rotate_xticklabels(ax, 45, ha='right', rotation_mode='anchor')
+    fig.tight_layout(pad=4.0)
+    ax.set_xlabel("Expense Categories", labelpad=15) 
+    ax.set_ylabel("Amount ($)", labelpad=15)  
+    ax.set_title("Allowable Business Expenses",fontsize=16)
+    bar_buf = charts.to_png(fig)
 
     return pie_buf, bar_buf
@@ -0,0 +1,29 @@
+"""
+Progress Reporting
+
+- Long-running stages (PDF pages OCR'd, statement pages extracted) call
+  report(done, total) as they go.
+- Whoever runs the work (e.g. a background job) installs a callback with
+  reporting(); the callback is held in a context variable, so concurrent
+  jobs on different threads each see only their own progress.
+- Without a callback, report() does nothing.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+_callback: ContextVar[Optional[Callable[[int, int], None]]] = ContextVar("progress_callback", default=None)
+
+def report(done: int, total: int):
+    callback = _callback.get()
+    if callback is not None:
+        callback(done, total)
+
+@contextmanager
+def reporting(callback: Callable[[int, int], None]):
+    token = _callback.set(callback)
+    try:
+        yield
+    finally:
+        _callback.reset(token)
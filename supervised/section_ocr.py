@@ -0,0 +1,58 @@
+"""
+Section-Targeted OCR (two-pass)
+
+- Pass 1: OCR a downscaled copy of the page to get rough word boxes cheaply.
+- Finds the lines holding the start and end markers of the section
+  (e.g. "Earnings" .. "Deductions") and turns them into a row band.
+- Pass 2: full-quality OCR of only that band; word boxes are shifted back
+  to page coordinates.
+- Falls back to OCR of the whole page when the markers are not found.
+"""
+
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+from supervised import ocr_engine
+from supervised.ocr_result import OCRResult
+
+LAYOUT_SCALE = 0.5   # Pass 1 works on a quarter of the pixels
+LAYOUT_CONFIG = r'--oem 3 --psm 6'
+BAND_PADDING = 12    # Full-resolution pixels kept above and below the band
+
+# Lines with their vertical extent: [(line_text, top, bottom), ...] in reading order
+def _lines(result: OCRResult):
+    bottoms = result.top + result.height
+    return [(" ".join(result.words[idx]), int(result.top[idx].min()), int(bottoms[idx].max()))
+            for idx in result.line_indices()]
+
+# Row band (y0, y1) from the start-marker line to the end-marker line below it
+def locate_section(image: np.ndarray, start_marker: str, end_marker: str,
+                   scale: float = LAYOUT_SCALE) -> Optional[Tuple[int, int]]:
+    small = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    layout = ocr_engine.image_to_data(small, LAYOUT_CONFIG)
+    start = end = None
+    for text, top, bottom in _lines(layout):
+        lowered = text.lower()
+        if start is None and start_marker.lower() in lowered:
+            start = top
+        elif start is not None and end_marker.lower() in lowered and top > start:
+            end = bottom
+            break
+    if start is None:
+        return None
+    y0 = max(0, int(start / scale) - BAND_PADDING)
+    y1 = image.shape[0] if end is None else min(image.shape[0], int(end / scale) + BAND_PADDING)
+    return y0, y1
+
+# Two-pass OCR of one section of a preprocessed page
+def ocr_section(image: np.ndarray, start_marker: str, end_marker: str,
+                config: str = ocr_engine.DEFAULT_CONFIG) -> OCRResult:
+    band = locate_section(image, start_marker, end_marker)
+    if band is None:
+        return ocr_engine.image_to_data(image, config)
+    y0, y1 = band
+    result = ocr_engine.image_to_data(image[y0:y1], config)
+    result.top += y0  # Back to page coordinates
+    return result
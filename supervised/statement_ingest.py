@@ -0,0 +1,254 @@
+"""
+Incremental Bank Statement Ingestion
+
+- Keeps a fingerprint of every ingested row per account in SQLite. A row is
+  new exactly when its fingerprint is unknown, so statements can arrive in
+  any order (last month's PDF after this month's still adds its rows).
+- Pages are fingerprinted before any table extraction: a hash of the page
+  text from its first transaction line on (pypdfium2, about 2ms a page; the
+  "downloaded at" header above the table is left out). Pages whose
+  fingerprint was ingested before are not extracted at all, so re-uploading
+  a statement costs the text pass only.
+- Overlapping uploads (this month's PDF repeating the last weeks of last
+  month's, with different page breaks) only cost the new rows: a page whose
+  rows are all known is skipped before cleaning and categorization.
+- Also keeps a per-account watermark: the latest ingested Post Date and the
+  Balance after it. When an upload continues past the watermark, its first
+  later row must carry on from that balance (balance + CR - DR); a mismatch
+  means a statement in between is missing and is reported.
+- The account number is read from the statement; without one (and no
+  account given) the upload is refused rather than mixed into another
+  account.
+- New rows are categorized and appended to the output store (append-only);
+  the watermark moves forward only after the store write.
+"""
+
+import os
+import re
+import time
+import hashlib
+import sqlite3
+import threading
+from io import BytesIO
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+import pypdfium2 as pdfium
+
+from supervised import bank_statements
+from storage import output_store
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DB = os.getenv("STATEMENT_WATERMARK_DB", os.path.join(current_dir, "..", "data", "statement_watermarks.sqlite"))
+STORE_DATASET = "bank_statement"
+ACCOUNT_NUMBER = re.compile(r"account\s*(?:no|number|num)?\.?\s*[:\-]?\s*([0-9xX*#]{6,})", re.IGNORECASE)
+FINGERPRINT_COLUMNS = ["Post Date", "Value Date", "Description", "DR", "CR", "Balance"]
+BALANCE = re.compile(r"^\s*(-?[\d,]*\.?\d+)\s*(CR|DR)?\s*$", re.IGNORECASE)
+BALANCE_TOLERANCE = 0.005
+TRANSACTION_LINE = re.compile(r"^\s*\d{2}/\d{2}/\d{4}\b", re.MULTILINE)  # A line starting with a Post Date
+
+# Text of every page (pdfium's text layer: much cheaper than pdfplumber's layout analysis)
+def page_texts(pdf_path) -> List[str]:
+    if isinstance(pdf_path, (str, os.PathLike)):
+        data = os.fspath(pdf_path)
+    elif isinstance(pdf_path, (bytes, bytearray, memoryview)):
+        data = bytes(pdf_path)
+    else:
+        pdf_path.seek(0)
+        data = pdf_path.read()
+        pdf_path.seek(0)  # The same upload is read again for the tables
+    pdf = pdfium.PdfDocument(data)
+    texts = []
+    try:
+        for index in range(len(pdf)):
+            page = pdf[index]
+            text_page = page.get_textpage()
+            texts.append(text_page.get_text_range())
+            text_page.close()
+            page.close()
+    finally:
+        pdf.close()
+    return texts
+
+# Account number printed in the statement (the first page that has one), or None
+def detect_account(pdf_path, texts: Optional[List[str]] = None) -> Optional[str]:
+    for text in texts if texts is not None else page_texts(pdf_path):
+        match = ACCOUNT_NUMBER.search(text)
+        if match:
+            return match.group(1)
+    return None
+
+# Fingerprint of a page's transactions: hash of its text from the first line starting with a
+# date (the whole text when there is none), so headers such as "downloaded at" do not count
+def page_fingerprint(text: str) -> str:
+    first = TRANSACTION_LINE.search(text)
+    body = text[first.start():] if first else text
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()[:16]
+
+# Signed amount of a printed balance ("686.27 CR" -> 686.27, "12.00 DR" -> -12.0), or None
+def parse_balance(balance) -> Optional[float]:
+    match = BALANCE.match(str(balance)) if balance is not None else None
+    if not match:
+        return None
+    amount = float(match.group(1).replace(",", ""))
+    return -amount if (match.group(2) or "").upper() == "DR" else amount
+
+# Balance continuity of the first row after the watermark: {"post_date", "expected", "found", "ok"},
+# or None when the rows do not continue past the watermark (or balances are not readable)
+def check_continuity(rows: pd.DataFrame, watermark: Tuple[pd.Timestamp, str]) -> Optional[Dict[str, Any]]:
+    later = rows[rows["Post Date"] >= watermark[0]]
+    previous = parse_balance(watermark[1])
+    if later.empty or previous is None or "Balance" not in later:
+        return None
+    first = later.iloc[0]
+    found = parse_balance(first["Balance"])
+    if found is None:
+        return None
+    credit, debit = (0.0 if pd.isna(first.get(column)) else float(first[column]) for column in ("CR", "DR"))
+    expected = previous + credit - debit
+    return {"post_date": first["Post Date"].date().isoformat(), "expected": round(expected, 2),
+            "found": found, "ok": abs(expected - found) < BALANCE_TOLERANCE}
+
+# Stable per-row fingerprint of the raw transaction fields (16 hex chars)
+def fingerprint_rows(df: pd.DataFrame) -> pd.Series:
+    columns = [c for c in FINGERPRINT_COLUMNS if c in df]
+    keys = df[columns].astype(str).agg("\x1f".join, axis=1)
+    return keys.map(lambda key: hashlib.sha256(key.encode("utf-8")).hexdigest()[:16])
+
+
+class WatermarkStore:
+    """SQLite table of per-account watermarks and ingested row fingerprints."""
+
+    def __init__(self, db_path: str = DEFAULT_DB):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS watermarks (
+                account TEXT PRIMARY KEY,
+                post_date TEXT NOT NULL,
+                balance TEXT,
+                updated TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS ingested_rows (
+                account TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                PRIMARY KEY (account, fingerprint)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS ingested_pages (
+                account TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                PRIMARY KEY (account, fingerprint)
+            ) WITHOUT ROWID;
+        """)
+
+    # (last Post Date, Balance after it) or None for a new account
+    def watermark(self, account: str) -> Optional[Tuple[pd.Timestamp, str]]:
+        with self._lock:
+            row = self._conn.execute("SELECT post_date, balance FROM watermarks WHERE account = ?",
+                                     (account,)).fetchone()
+        return (pd.Timestamp(row[0]), row[1]) if row else None
+
+    # Which of the row (or page, table="ingested_pages") fingerprints were already ingested for the account
+    def known(self, account: str, fingerprints: Iterable[str], table: str = "ingested_rows") -> set:
+        fingerprints = list(fingerprints)
+        known = set()
+        with self._lock:
+            for start in range(0, len(fingerprints), 500):  # Stay under SQLite's variable limit
+                chunk = fingerprints[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT fingerprint FROM {table} WHERE account = ? AND fingerprint IN "
+                    f"({','.join('?' * len(chunk))})", [account] + chunk).fetchall()
+                known.update(row[0] for row in rows)
+        return known
+
+    # Record a page whose rows are all ingested
+    def add_page(self, account: str, fingerprint: str):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR IGNORE INTO ingested_pages (account, fingerprint) VALUES (?, ?)",
+                               (account, fingerprint))
+
+    # Record ingested rows and move the watermark forward (never backwards)
+    def advance(self, account: str, fingerprints: Iterable[str], post_date: pd.Timestamp, balance: str):
+        current = self.watermark(account)
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR IGNORE INTO ingested_rows (account, fingerprint) VALUES (?, ?)",
+                                   [(account, fp) for fp in fingerprints])
+            if current is None or post_date >= current[0]:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO watermarks (account, post_date, balance, updated) VALUES (?, ?, ?, ?)",
+                    (account, post_date.isoformat(), balance, time.strftime("%Y-%m-%dT%H:%M:%S")))
+
+
+_store: Optional[WatermarkStore] = None
+_store_lock = threading.Lock()
+
+def get_store() -> WatermarkStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = WatermarkStore()
+        return _store
+
+# Default sink: append to the bank statement dataset of the output store
+def store_sink(batch: pd.DataFrame):
+    output_store.append(STORE_DATASET, batch)
+
+# Every ingested transaction of one account, read back from the output store
+def account_history(account: str, columns=None) -> pd.DataFrame:
+    return output_store.read(STORE_DATASET, columns, filters=[("Account", "==", account)])
+
+# Ingest only the transactions not seen before for this account (raises ValueError when the
+# statement shows no account number and none is given). Pages ingested before are not extracted.
+# Returns (new rows, categorized; the account, counts of pages/rows skipped and ingested, and
+# the balance continuity check against the previous upload or None). rows_skipped counts the
+# known rows of extracted pages only.
+# sink receives each page's new rows (default: the output store).
+def ingest_bank_statement(pdf_path, account: Optional[str] = None,
+                          sink: Optional[Callable[[pd.DataFrame], None]] = store_sink,
+                          workers=None) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    if isinstance(pdf_path, (bytes, bytearray, memoryview)):
+        pdf_path = BytesIO(pdf_path)
+    texts = page_texts(pdf_path)
+    account = account or detect_account(pdf_path, texts)
+    if not account:
+        raise ValueError("No account number found in the statement; give the account to ingest it under")
+    store = get_store()
+    watermark = store.watermark(account)
+    page_prints = [page_fingerprint(text) for text in texts]
+    known_pages = store.known(account, page_prints, table="ingested_pages")
+    pending = [n for n, fingerprint in enumerate(page_prints) if fingerprint not in known_pages]
+    counts = {"account": account, "pages": len(texts), "pages_skipped": len(texts) - len(pending),
+              "pages_extracted": len(pending), "rows_new": 0, "rows_skipped": 0, "continuity": None}
+    new_batches = []
+
+    # Only pages not ingested before go through table extraction
+    for n, batch in (bank_statements.iter_numbered_pages(pdf_path, workers, pending) if pending else ()):
+        if batch is None:
+            store.add_page(account, page_prints[n])  # No transactions on it
+            continue
+        # Newness is decided by fingerprint alone; a page with only known rows costs no categorization
+        fingerprints = fingerprint_rows(batch)
+        known = store.known(account, fingerprints)
+        is_new = ~fingerprints.isin(known)
+        counts["rows_skipped"] += int((~is_new).sum())
+        if not is_new.any():
+            counts["pages_skipped"] += 1
+            store.add_page(account, page_prints[n])
+            continue
+
+        new_rows = bank_statements.categorize_batch(batch[is_new].reset_index(drop=True))
+        new_rows.insert(0, "Account", account)
+        if watermark is not None and counts["continuity"] is None:
+            counts["continuity"] = check_continuity(new_rows, watermark)
+        if sink is not None:
+            sink(new_rows)
+        latest = new_rows[new_rows["Post Date"] == new_rows["Post Date"].max()].iloc[-1]
+        store.advance(account, fingerprints[is_new], latest["Post Date"], latest.get("Balance"))
+        store.add_page(account, page_prints[n])  # Only once its rows are stored
+        counts["rows_new"] += len(new_rows)
+        new_batches.append(new_rows)
+
+    if not new_batches:
+        return pd.DataFrame(columns=["Account"] + bank_statements.STATEMENT_COLUMNS
+                            + ["Cleaned_Description", "Category"]), counts
+    return pd.concat(new_batches, ignore_index=True), counts
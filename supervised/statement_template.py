@@ -0,0 +1,156 @@
+"""
+Bank Statement Layout Templates (fast path for table extraction)
+
+- Learns a template from the first page whose table starts with the
+  "Post Date" header: column x-boundaries, header names and header words
+  (every word whose vertical middle lies in the header row, so the second
+  line of two-line cells like "Value\nDate" counts too).
+- Caches templates per layout fingerprint (header words, their positions
+  and the page width), so later pages and later statements from the same
+  bank skip pdfplumber's ruling-line table detection.
+- Parses matching pages straight from page.extract_words() coordinates.
+- Returns None for pages that do not match, so callers fall back to
+  extract_tables().
+"""
+
+import os
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+ENABLED = os.getenv("BANK_TEMPLATE_FAST_PATH", "1") != "0"
+MAX_TEMPLATES = 32
+X_TOLERANCE = 2      # Points a header word may move between pages
+LINE_TOLERANCE = 3   # Words within this many points vertically share a line
+
+
+class StatementTemplate:
+    """Column layout of one bank's statement table."""
+
+    def __init__(self, header: List[str], boundaries: List[float], header_words: List[Tuple[str, float]],
+                 header_height: float, page_width: float, anchor_offset: float = 0.0):
+        self.header = header                # Column names, as in the table's header row
+        self.boundaries = boundaries        # Column x-boundaries, len(header) + 1
+        self.header_words = header_words    # (text, x0) of the header row words, sorted
+        self.header_height = header_height
+        self.page_width = page_width
+        self.anchor_offset = anchor_offset  # Top of the leftmost header word below the row's top
+
+    @property
+    def fingerprint(self) -> Tuple:
+        return (round(self.page_width),) + tuple((text, round(x0)) for text, x0 in self.header_words)
+
+    # Learn the layout from a pdfplumber Table whose first row is the header (named by `header`)
+    @classmethod
+    def learn(cls, page, table, header, words) -> Optional["StatementTemplate"]:
+        header_row = table.rows[0]
+        if any(cell is None for cell in header_row.cells):
+            return None  # Merged header cells: no clean column boundaries
+        x0, top, x1, bottom = header_row.bbox
+        boundaries = [cell[0] for cell in header_row.cells] + [header_row.cells[-1][2]]
+        in_header = [w for w in words if top <= (w["top"] + w["bottom"]) / 2 <= bottom and x0 <= w["x0"] < x1]
+        if not in_header:
+            return None
+        anchor = min(in_header, key=lambda w: (w["x0"], w["top"]))
+        return cls(header, boundaries, sorted((w["text"], w["x0"]) for w in in_header), bottom - top,
+                   page.width, anchor["top"] - top)
+
+    # Bottom of this template's header row on the page, or None if the page does not match
+    def locate_header(self, page, words) -> Optional[float]:
+        if abs(page.width - self.page_width) > X_TOLERANCE:
+            return None
+        first_text, first_x0 = min(self.header_words, key=lambda word: word[1])
+        for anchor in words:
+            if anchor["text"] != first_text or abs(anchor["x0"] - first_x0) > X_TOLERANCE:
+                continue
+            top = anchor["top"] - self.anchor_offset  # Same words, same test as in learn()
+            found = sorted((w["text"], w["x0"]) for w in words
+                           if top - 1 <= (w["top"] + w["bottom"]) / 2 <= top + self.header_height + 1
+                           and self.boundaries[0] <= w["x0"] < self.boundaries[-1])
+            if len(found) == len(self.header_words) and all(
+                    text == want_text and abs(x0 - want_x0) <= X_TOLERANCE
+                    for (text, x0), (want_text, want_x0) in zip(found, self.header_words)):
+                return top + self.header_height
+        return None
+
+    # Lowest horizontal ruling spanning the table below the header (page bottom if none)
+    def _table_bottom(self, page, header_bottom: float) -> float:
+        left, right = self.boundaries[0], self.boundaries[-1]
+        rulings = [edge["top"] for edge in page.horizontal_edges
+                   if edge["top"] > header_bottom and edge["x0"] <= left + X_TOLERANCE
+                   and edge["x1"] >= right - X_TOLERANCE]
+        return max(rulings) if rulings else page.height
+
+    # Table rows of a matching page (header excluded), or None to fall back to extract_tables()
+    def parse_page(self, page, words) -> Optional[List[List[Optional[str]]]]:
+        header_bottom = self.locate_header(page, words)
+        if header_bottom is None:
+            return None
+        bottom = self._table_bottom(page, header_bottom)
+        left, right = self.boundaries[0], self.boundaries[-1]
+        body = sorted((w for w in words if w["top"] >= header_bottom and w["bottom"] <= bottom
+                       and left <= (w["x0"] + w["x1"]) / 2 < right),
+                      key=lambda w: (w["top"], w["x0"]))
+
+        # Group words into text lines, then lines into rows: a row starts at a line
+        # with text in the first column (Post Date); other lines continue the row above
+        lines, line_top = [], None
+        for word in body:
+            if line_top is None or word["top"] - line_top > LINE_TOLERANCE:
+                lines.append([])
+                line_top = word["top"]
+            lines[-1].append(word)
+
+        n_columns = len(self.header)
+        rows = []
+        for line in lines:
+            cells: Dict[int, List[str]] = {}
+            for word in line:
+                column = bisect_right(self.boundaries, (word["x0"] + word["x1"]) / 2) - 1
+                cells.setdefault(min(column, n_columns - 1), []).append(word["text"])
+            if 0 in cells:
+                rows.append([[] for _ in range(n_columns)])
+            elif not rows:
+                return None  # Text above the first row: not the layout we learned
+            for column, texts in cells.items():
+                rows[-1][column].append(" ".join(texts))
+        return [["\n".join(cell) if cell else None for cell in row] for row in rows]
+
+
+_templates: "OrderedDict[Tuple, StatementTemplate]" = OrderedDict()
+_pages = {"template": 0, "fallback": 0}
+_lock = threading.Lock()
+
+# Cached template whose header is on this page (most recently used first), or None
+def find_template(page, words) -> Optional[StatementTemplate]:
+    with _lock:
+        candidates = list(reversed(_templates.items()))
+    for fingerprint, template in candidates:
+        if template.locate_header(page, words) is not None:
+            with _lock:
+                if fingerprint in _templates:
+                    _templates.move_to_end(fingerprint)
+            return template
+    return None
+
+# Learn a template from the page's header table and cache it (bounded, least recently used dropped)
+def remember(page, table, header, words) -> Optional[StatementTemplate]:
+    template = StatementTemplate.learn(page, table, header, words)
+    if template is not None:
+        with _lock:
+            _templates[template.fingerprint] = template
+            _templates.move_to_end(template.fingerprint)
+            while len(_templates) > MAX_TEMPLATES:
+                _templates.popitem(last=False)
+    return template
+
+def record_page(fast: bool):
+    with _lock:
+        _pages["template" if fast else "fallback"] += 1
+
+# Pages parsed from templates vs. by table detection (this process)
+def stats() -> Dict[str, int]:
+    with _lock:
+        return {"templates": len(_templates), "pages_template": _pages["template"],
+                "pages_fallback": _pages["fallback"]}
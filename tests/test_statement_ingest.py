@@ -0,0 +1,40 @@
+import os
+
+import pytest
+
+from supervised import statement_ingest
+
+SAMPLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "bank_statement.pdf")
+
+
+@pytest.fixture
+def watermarks(tmp_path, monkeypatch):
+    store = statement_ingest.WatermarkStore(str(tmp_path / "watermarks.sqlite"))
+    monkeypatch.setattr(statement_ingest, "_store", store)
+    return store
+
+
+# The app and the job queue pass the upload's bytes and no account: it is read from the statement
+def test_ingest_sample_without_account(watermarks):
+    with open(SAMPLE, "rb") as f:
+        data = f.read()
+    rows, counts = statement_ingest.ingest_bank_statement(data, sink=None)
+    assert counts["account"] == "50439602642"
+    assert counts["rows_new"] == len(rows) > 0
+    assert watermarks.watermark("50439602642") is not None
+
+
+# Pages ingested before are recognized from their text and never table-extracted again
+def test_reingest_skips_extraction(watermarks, monkeypatch):
+    with open(SAMPLE, "rb") as f:
+        data = f.read()
+    _, first = statement_ingest.ingest_bank_statement(data, sink=None)
+    assert first["pages_extracted"] == first["pages"] == 8
+
+    def extract(*args, **kwargs):
+        raise AssertionError("a known page was extracted again")
+
+    monkeypatch.setattr(statement_ingest.bank_statements, "iter_numbered_pages", extract)
+    rows, again = statement_ingest.ingest_bank_statement(data, sink=None)
+    assert rows.empty
+    assert again["pages_skipped"] == 8 and again["pages_extracted"] == 0
@@ -0,0 +1,29 @@
+import os
+
+import pandas as pd
+
+from unsupervised import text_clustering
+
+SAMPLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "unsupervised_data.csv")
+
+
+def clusters_by_description(labels, descriptions):
+    return {description: int(label) for description, label in zip(descriptions, labels)}
+
+
+# Cheap transactions of different kinds get their own clusters; the two subscriptions share one
+def test_descriptions_separate_cheap_merchants():
+    df = pd.read_csv(SAMPLE)
+    labels, _ = text_clustering.fit_predict(df["Description"], df["Amount"].to_numpy(dtype=float), 3)
+    clusters = clusters_by_description(labels, df["Description"])
+    assert clusters["Coffee Shop"] != clusters["OTT Subscription"]
+    assert clusters["OTT Subscription"] == clusters["TV Subscription"]
+
+
+# The streamed CSV path keeps the same separation
+def test_cluster_csv_separates_cheap_merchants(tmp_path):
+    output = str(tmp_path / "clustered.csv")
+    text_clustering.cluster_csv(SAMPLE, output, 3)
+    df = pd.read_csv(output)
+    clusters = clusters_by_description(df["Cluster_KMeans_Mapped"], df["Description"])
+    assert clusters["Coffee Shop"] != clusters["OTT Subscription"]
@@ -0,0 +1,135 @@
+"""
+Exact 1-D k-means (Ckmeans.1d.dp) for transaction amounts
+
+- Sorts the amounts once and collapses repeated amounts into weighted
+  unique values (amounts repeat a lot, so the search runs on far fewer points).
+- Finds the partition into k contiguous groups with the minimum total
+  within-cluster sum of squares. This is the global optimum, so the result
+  is deterministic (no random restarts).
+- Dynamic programme: D[m][i] = min over j of D[m-1][j-1] + SSE(j..i). The
+  optimal j never decreases as i grows, so each of the k levels is solved by
+  divide and conquer in O(n log n). Every recursion depth is one vectorized
+  numpy step.
+- SSE of any segment is O(1) from prefix sums of w, w*x and w*x^2.
+- Cluster ids are ordered by amount (0 = lowest), so no remapping is needed.
+- NaN/inf values or weights, negative weights, and a k below 1 or above the
+  number of distinct values raise ValueError; callers with few distinct
+  amounts ask for fewer clusters themselves.
+"""
+
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+# Prefix sums of w, w*x, w*x^2 (length n + 1, starting at 0); x is centered for numerical stability
+def _prefix_sums(x: np.ndarray, w: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    x = x - np.average(x, weights=w)
+    zero = np.zeros(1)
+    return (np.concatenate([zero, np.cumsum(w)]),
+            np.concatenate([zero, np.cumsum(w * x)]),
+            np.concatenate([zero, np.cumsum(w * x * x)]))
+
+# Within-cluster sum of squares of the segments x[j..i] (inclusive), elementwise
+def _sse(prefix, j: np.ndarray, i: np.ndarray) -> np.ndarray:
+    W, S1, S2 = prefix
+    weight = W[i + 1] - W[j]
+    total = S1[i + 1] - S1[j]
+    return np.maximum(S2[i + 1] - S2[j] - total * total / weight, 0.0)
+
+# One level of the programme: best cost and first point of the last cluster for every
+# end point i >= m, given the previous level's costs. Divide and conquer over i: the best
+# start for the middle row bounds the candidates for the rows above and below it.
+def _fill_level(prev: np.ndarray, m: int, prefix) -> Tuple[np.ndarray, np.ndarray]:
+    n = prev.size
+    cost = np.full(n, np.inf)
+    start = np.zeros(n, dtype=np.int64)
+    # Pending row ranges [lo, hi] with their candidate start ranges [opt_lo, opt_hi]
+    lo, hi = np.array([m]), np.array([n - 1])
+    opt_lo, opt_hi = np.array([m]), np.array([n - 1])
+    while lo.size:
+        mid = (lo + hi) // 2
+        first, last = opt_lo, np.minimum(opt_hi, mid)
+        counts = last - first + 1
+        offsets = np.cumsum(counts) - counts
+        task = np.repeat(np.arange(mid.size), counts)
+        j = first[task] + np.arange(counts.sum()) - offsets[task]
+        candidate = prev[j - 1] + _sse(prefix, j, mid[task])
+
+        # First minimum of each task's candidates
+        best_cost = np.minimum.reduceat(candidate, offsets)
+        hits = np.flatnonzero(candidate == best_cost[task])
+        hits = hits[np.concatenate([[True], task[hits[1:]] != task[hits[:-1]]])]
+        best = j[hits]
+        cost[mid], start[mid] = best_cost, best
+
+        left, right = lo <= mid - 1, mid + 1 <= hi
+        lo, hi, opt_lo, opt_hi = (np.concatenate([lo[left], mid[right] + 1]),
+                                  np.concatenate([mid[left] - 1, hi[right]]),
+                                  np.concatenate([opt_lo[left], best[right]]),
+                                  np.concatenate([best[left], opt_hi[right]]))
+    return cost, start
+
+# First index of each cluster in the sorted unique values x (weights w), for the optimal
+# partition into k clusters (fewer if x has fewer than k distinct values)
+def optimal_breaks(x: np.ndarray, w: np.ndarray, k: int) -> np.ndarray:
+    n = x.size
+    k = max(1, min(k, n))
+    if k == 1:
+        return np.zeros(1, dtype=np.int64)
+    prefix = _prefix_sums(x, w)
+    ends = np.arange(n)
+    cost = _sse(prefix, np.zeros(n, dtype=np.int64), ends)
+    starts = []
+    for m in range(1, k - 1):
+        cost, start = _fill_level(cost, m, prefix)
+        starts.append(start)
+
+    # Last level: only the full range [0, n - 1] is needed
+    j = np.arange(k - 1, n)
+    last = int(j[np.argmin(cost[j - 1] + _sse(prefix, j, np.full(j.size, n - 1)))])
+    breaks = [last]
+    for start in reversed(starts):
+        breaks.append(int(start[breaks[-1] - 1]))
+    return np.array([0] + breaks[::-1], dtype=np.int64)
+
+# Sorted distinct values and their total weights
+def compress(values, weights=None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    values = np.asarray(values, dtype=np.float64).ravel()
+    x, inverse = np.unique(values, return_inverse=True)
+    if weights is None:
+        w = np.bincount(inverse, minlength=x.size).astype(np.float64)
+    else:
+        w = np.bincount(inverse, weights=np.asarray(weights, dtype=np.float64).ravel(), minlength=x.size)
+    return x, w, inverse
+
+# Optimal 1-D clustering of the values: (cluster id per value, 0 = lowest amounts; sorted cluster means)
+def ckmeans(values, k: int = 3, weights=None) -> Tuple[np.ndarray, np.ndarray]:
+    if not np.isfinite(np.asarray(values, dtype=np.float64)).all():
+        raise ValueError("ckmeans values must be finite (drop NaN/inf amounts first)")
+    if weights is not None:
+        w = np.asarray(weights, dtype=np.float64)
+        if not np.isfinite(w).all() or (w < 0).any():
+            raise ValueError("ckmeans weights must be finite and non-negative")
+    x, w, inverse = compress(values, weights)
+    if k < 1 or k > x.size:
+        raise ValueError(f"ckmeans needs 1 <= k <= {x.size} (the number of distinct values), got k={k}")
+    breaks = optimal_breaks(x, w, k)
+    centers = np.add.reduceat(w * x, breaks) / np.add.reduceat(w, breaks)
+    labels = np.searchsorted(breaks, inverse, side="right") - 1
+    return labels, centers
+
+# Decision thresholds between consecutive sorted centers (midpoints): a value belongs to
+# cluster np.searchsorted(thresholds, value)
+def thresholds(centers: np.ndarray) -> np.ndarray:
+    centers = np.asarray(centers, dtype=np.float64)
+    return (centers[:-1] + centers[1:]) / 2
+
+# Total within-cluster sum of squares of a labelling
+def total_sse(values, labels, weights: Optional[np.ndarray] = None) -> float:
+    values = np.asarray(values, dtype=np.float64)
+    w = np.ones_like(values) if weights is None else np.asarray(weights, dtype=np.float64)
+    sums = np.bincount(labels, weights=w * values)
+    counts = np.bincount(labels, weights=w)
+    means = np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0)
+    return float(np.sum(w * (values - means[labels]) ** 2))
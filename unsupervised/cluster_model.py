@@ -0,0 +1,182 @@
+"""
+Persisted Amount Cluster Model (versioned)
+
+- A fitted model is a small JSON file: version, k, scaler parameters (mean and
+  standard deviation of the training amounts), sorted cluster centers and the
+  decision thresholds between them. Files live in data/cluster_models
+  (CLUSTER_MODEL_DIR), one per version, and are never rewritten.
+- New amounts are labelled with one vectorized binary search against the
+  thresholds (np.searchsorted), so labelling does not refit and cluster
+  boundaries stay put between uploads.
+- Refitting is explicit: run `refit` (e.g. from a nightly schedule). It fits
+  on every amount in the output store, or on a CSV, and saves the next
+  version. The latest version for a k is picked up on the next upload.
+
+Usage:
+    python -m unsupervised.cluster_model refit --k 3
+    python -m unsupervised.cluster_model refit --csv transactions.csv
+    python -m unsupervised.cluster_model show
+    python -m unsupervised.cluster_model assign new_transactions.csv -o labelled.csv
+"""
+
+import os
+import re
+import json
+import time
+import argparse
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from unsupervised import ckmeans
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+MODEL_DIR = os.getenv("CLUSTER_MODEL_DIR", os.path.join(current_dir, "..", "data", "cluster_models"))
+MODEL_FILE = re.compile(r"^amount-k(\d+)-v(\d+)\.json$")
+
+
+class ClusterModel:
+    """Fitted 1-D amount clusters: ids 0..k-1 from the lowest to the highest amounts."""
+
+    def __init__(self, centers, mean: float, scale: float, k: Optional[int] = None, version: int = 0,
+                 rows: int = 0, source: str = "", fitted_at: str = ""):
+        self.centers = np.asarray(centers, dtype=np.float64)  # Sorted, in amount units
+        self.k = k or self.centers.size  # Requested k (fewer centers if there were fewer distinct amounts)
+        self.thresholds = ckmeans.thresholds(self.centers)
+        self.mean = mean
+        self.scale = scale
+        self.version = version
+        self.rows = rows
+        self.source = source
+        self.fitted_at = fitted_at
+
+    # Fit on amounts (optionally weighted, e.g. a histogram of them)
+    @classmethod
+    def fit(cls, amounts, k: int, weights=None, source: str = "") -> "ClusterModel":
+        amounts = np.asarray(amounts, dtype=np.float64)
+        w = np.ones_like(amounts) if weights is None else np.asarray(weights, dtype=np.float64)
+        # Fewer centers than k when there are fewer distinct amounts
+        _, centers = ckmeans.ckmeans(amounts, min(k, np.unique(amounts).size), weights=w)
+        mean = float(np.average(amounts, weights=w))
+        scale = float(np.sqrt(np.average((amounts - mean) ** 2, weights=w))) or 1.0
+        return cls(centers, mean, scale, k, rows=int(w.sum()), source=source,
+                   fitted_at=time.strftime("%Y-%m-%dT%H:%M:%S"))
+
+    # Cluster id per amount (binary search against the thresholds)
+    def assign(self, amounts) -> np.ndarray:
+        return np.searchsorted(self.thresholds, np.asarray(amounts, dtype=np.float64))
+
+    # Amounts on the scale the centers were standardized with (like StandardScaler)
+    def standardize(self, amounts) -> np.ndarray:
+        return (np.asarray(amounts, dtype=np.float64) - self.mean) / self.scale
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"version": self.version, "k": self.k, "fitted_at": self.fitted_at, "rows": self.rows,
+                "source": self.source, "scaler": {"mean": self.mean, "scale": self.scale},
+                "centers": self.centers.tolist(), "scaled_centers": self.standardize(self.centers).tolist(),
+                "thresholds": self.thresholds.tolist()}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ClusterModel":
+        return cls(data["centers"], data["scaler"]["mean"], data["scaler"]["scale"], data["k"],
+                   data["version"], data.get("rows", 0), data.get("source", ""), data.get("fitted_at", ""))
+
+
+_models: Dict[str, ClusterModel] = {}
+_lock = threading.Lock()
+
+# {k: {version: path}} of the saved models
+def _saved(model_dir: str = MODEL_DIR) -> Dict[int, Dict[int, str]]:
+    saved: Dict[int, Dict[int, str]] = {}
+    if os.path.isdir(model_dir):
+        for name in os.listdir(model_dir):
+            match = MODEL_FILE.match(name)
+            if match:
+                saved.setdefault(int(match.group(1)), {})[int(match.group(2))] = os.path.join(model_dir, name)
+    return saved
+
+# Save as the next version for its k (written to a temporary file, then renamed)
+def save(model: ClusterModel, model_dir: str = MODEL_DIR) -> ClusterModel:
+    os.makedirs(model_dir, exist_ok=True)
+    with _lock:
+        model.version = max(_saved(model_dir).get(model.k, {0: ""})) + 1
+        path = os.path.join(model_dir, f"amount-k{model.k}-v{model.version:04d}.json")
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(model.to_dict(), f, indent=2)
+        os.replace(path + ".tmp", path)
+    return model
+
+def load(path: str) -> ClusterModel:
+    with open(path, encoding="utf-8") as f:
+        return ClusterModel.from_dict(json.load(f))
+
+
+# Latest saved model for k (or a given version), or None if none was fitted yet.
+# Saved versions never change, so each is read from disk once.
+def get_model(k: int, version: Optional[int] = None, model_dir: str = MODEL_DIR) -> Optional[ClusterModel]:
+    versions = _saved(model_dir).get(k)
+    if not versions or (version is not None and version not in versions):
+        return None
+    path = versions[version if version is not None else max(versions)]
+    with _lock:
+        if path not in _models:
+            _models[path] = load(path)
+        return _models[path]
+
+# Fit a new version on every amount in the output store (or a CSV, streamed) and save it
+def refit(k: int, csv_path: Optional[str] = None, model_dir: str = MODEL_DIR) -> ClusterModel:
+    if csv_path is not None:
+        from unsupervised.streaming_clustering import amount_histogram
+        amounts, weights = amount_histogram(csv_path).weighted_amounts()
+        source = os.path.abspath(csv_path)
+    else:
+        from storage import output_store
+        amounts = output_store.read("clustered_transactions", columns=["Amount"])["Amount"].to_numpy(dtype=float)
+        amounts, weights = amounts[np.isfinite(amounts)], None
+        source = "output store: clustered_transactions"
+    if not len(amounts):
+        raise ValueError(f"No amounts to fit on in {source}")
+    return save(ClusterModel.fit(amounts, k, weights, source), model_dir)
+
+# Label a CSV of new transactions with a saved model, chunk by chunk
+def assign_csv(csv_path: str, output_path: str, model: ClusterModel) -> int:
+    from unsupervised.streaming_clustering import OUTPUT_COLUMNS, read_chunks
+    rows = 0
+    with open(output_path, "w", newline="", encoding="utf-8") as out:
+        for index, chunk in enumerate(read_chunks(csv_path, OUTPUT_COLUMNS[:3])):
+            chunk = chunk.dropna(subset=["Amount"])
+            chunk.assign(Cluster_KMeans_Mapped=model.assign(chunk["Amount"].to_numpy()))[OUTPUT_COLUMNS] \
+                .to_csv(out, header=index == 0, index=False)
+            rows += len(chunk)
+    return rows
+
+def main(argv: Optional[List[str]] = None):
+    from unsupervised.clustering import N_CLUSTERS
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    refit_parser = commands.add_parser("refit", help="Fit and save the next model version")
+    refit_parser.add_argument("--csv", help="Fit on this CSV instead of the output store")
+    show_parser = commands.add_parser("show", help="Print the latest model")
+    assign_parser = commands.add_parser("assign", help="Label a CSV with the latest model")
+    assign_parser.add_argument("source")
+    assign_parser.add_argument("-o", "--output", required=True)
+    for sub in (refit_parser, show_parser, assign_parser):
+        sub.add_argument("--k", type=int, default=N_CLUSTERS, help="Number of amount clusters")
+    args = parser.parse_args(argv)
+
+    if args.command == "refit":
+        print(json.dumps(refit(args.k, args.csv).to_dict(), indent=2))
+        return
+    model = get_model(args.k)
+    if model is None:
+        parser.exit(1, f"No saved model for k={args.k}; run refit first\n")
+    if args.command == "show":
+        print(json.dumps(model.to_dict(), indent=2))
+    else:
+        start = time.perf_counter()
+        rows = assign_csv(args.source, args.output, model)
+        print(f"{rows} rows labelled with model v{model.version} in {time.perf_counter() - start:.2f}s")
+
+if __name__ == "__main__":
+    main()
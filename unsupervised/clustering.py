@@ -1,84 +1,123 @@
 """
 - Imports necessary libraries for clustering and visualization.
-- Standardizes the 'Amount' column and applies KMeans clustering.
-- Maps clusters to low, medium, high categories.
-- Saves results to a CSV with transaction details and cluster labels.
+- Labels the 'Amount' column with the saved amount cluster model (exact 1-D
+  k-means, see ckmeans.py and cluster_model.py); cluster ids are ordered from
+  low to high amounts.
+- Optionally (CLUSTER_USE_DESCRIPTIONS=1) clusters on hashed Description words
+  as well, see text_clustering.py.
+- Appends results (transaction details and cluster labels) to the output store.
 - Generates and returns bar and pie charts for transaction distribution.
+- Uploads in the app go through cluster_upload: the CSV is labelled chunk by
+  chunk into a clustered CSV on disk (streaming_clustering.py), and only the
+  run summary, a sample of rows and the charts (drawn from the per-cluster
+  counts) are returned.
 """
 
+import os
+
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
 import seaborn as sns
-from sklearn.cluster import KMeans
-from sklearn.preprocessing import StandardScaler
-
-# Method to perform KMeans clustering and save results to CSV
-def perform_clustering_and_visualize(data):
-    # Convert data to DataFrame
-    df = pd.DataFrame(data)
-    
-    # Standardizing the Amount column
-    scaler = StandardScaler()
-    df['Amount_Scaled'] = scaler.fit_transform(df[['Amount']])
-    
-    # Apply KMeans with 3 clusters
-    kmeans = KMeans(n_clusters=3, random_state=42)
-    df['Cluster_KMeans'] = kmeans.fit_predict(df[['Amount_Scaled']])
-    
-    # Sorting the cluster centers to map them correctly
-    cluster_centers_sorted = sorted(zip(kmeans.cluster_centers_.flatten(), range(len(kmeans.cluster_centers_))), key=lambda x: x[0])
-    
-    # Mapping clusters based on sorted centers to ensure lowest amount goes to Cluster 0, then Cluster 1, and highest goes to Cluster 2
-    cluster_mapping = {cluster_id: new_id for new_id, (center, cluster_id) in enumerate(cluster_centers_sorted)}
-    
-    # Applying the new cluster mapping
-    df['Cluster_KMeans_Mapped'] = df['Cluster_KMeans'].map(cluster_mapping)
-    
-    # Saving the DataFrame to a new CSV file
-    output_file_path = r'C:\BFSI_OCR\data\clustered_transactions.csv'
-    df[['Transaction ID', 'Description', 'Amount', 'Cluster_KMeans_Mapped']].to_csv(output_file_path, index=False)
-
-    # Set the style for the plots
-    sns.set(style="whitegrid")
+from storage import output_store
+from supervised import charts
+from unsupervised import cluster_model
+
+N_CLUSTERS = int(os.getenv("CLUSTER_COUNT", "3"))
+SAMPLE_ROWS = int(os.getenv("CLUSTER_SAMPLE_ROWS", "1000"))  # Clustered rows returned for display
+USE_DESCRIPTIONS = os.getenv("CLUSTER_USE_DESCRIPTIONS", "0") == "1"  # Cluster on Description too (text_clustering.py)
+sns.set(style="whitegrid")  # Once at import: jobs draw concurrently and must not change rcParams mid-plot
+AMOUNT_LEVELS = {3: ["Low", "Medium", "High"], 2: ["Low", "High"], 4: ["Low", "Medium", "High", "Very High"]}
+
+# Descriptive pie chart label per cluster id (0 = lowest amounts)
+def cluster_names(k):
+    levels = AMOUNT_LEVELS.get(k)
+    return {cluster_id: f"Cluster {cluster_id}: {levels[cluster_id]} Amount" if levels else f"Cluster {cluster_id}"
+            for cluster_id in range(k)}
+
+# Method to cluster transactions by amount (k clusters, low to high) and save the results;
+# with use_descriptions the Description is clustered too (fit statistics end up in df.attrs["fit_stats"])
+def perform_clustering_and_visualize(data, k=N_CLUSTERS, use_descriptions=USE_DESCRIPTIONS):
+    # Convert data to DataFrame (an uploaded DataFrame is used as is, not copied)
+    df = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
+
+    # Label the amounts with the saved model for k (ids ordered by amount); the first upload
+    # fits and saves version 1, later versions come from an explicit refit
+    amounts = df['Amount'].to_numpy(dtype=float)
+    if use_descriptions:
+        from unsupervised import text_clustering
+        df['Cluster_KMeans_Mapped'], df.attrs['fit_stats'] = text_clustering.fit_predict(df['Description'], amounts, k)
+        cluster_labels = text_clustering.cluster_names(df['Description'], df['Cluster_KMeans_Mapped'].to_numpy())
+    else:
+        model = cluster_model.get_model(k)
+        if model is None:
+            model = cluster_model.save(cluster_model.ClusterModel.fit(amounts[np.isfinite(amounts)], k, source="first upload"))
+        df['Cluster_KMeans_Mapped'] = model.assign(amounts)
+        cluster_labels = cluster_names(k)
+
+    # Appending the results to the clustered transactions dataset of the output store
+    output_store.append("clustered_transactions", df[['Transaction ID', 'Description', 'Amount', 'Cluster_KMeans_Mapped']]
+                        .astype({'Amount': 'float64'}))  # Same Amount type as the streaming path
+
+    counts = np.bincount(df['Cluster_KMeans_Mapped'].to_numpy(dtype=np.int64), minlength=k)
+    bar_fig, pie_fig = plot_cluster_counts(counts, cluster_labels, k)
+    return df, bar_fig, pie_fig
+
+# Method to cluster an uploaded CSV (bytes buffer or path) without loading it: rows are labelled
+# chunk by chunk into output_path and the output store. Returns (run summary, the first
+# SAMPLE_ROWS clustered rows, bar chart, pie chart).
+def cluster_upload(source, output_path, k=N_CLUSTERS, use_descriptions=USE_DESCRIPTIONS):
+    from unsupervised import streaming_clustering  # It imports N_CLUSTERS from here
+    if use_descriptions:
+        from unsupervised import text_clustering
+        summary = text_clustering.cluster_csv(source, output_path, k, to_store=True)
+    else:
+        # The saved model for k labels the rows; the first upload fits version 1 on its amount histogram
+        model = cluster_model.get_model(k)
+        if model is None:
+            amounts, weights = streaming_clustering.amount_histogram(source).weighted_amounts()
+            if not len(amounts):
+                raise ValueError("No rows with an amount to cluster")
+            model = cluster_model.save(cluster_model.ClusterModel.fit(amounts, k, weights, source="first upload"))
+        summary = streaming_clustering.cluster_csv(source, output_path, k, to_store=True, model=model)
+    summary["output_path"] = output_path
+
+    sample = pd.read_csv(output_path, nrows=SAMPLE_ROWS)
+    if use_descriptions:
+        cluster_labels = text_clustering.cluster_names(sample['Description'], sample['Cluster_KMeans_Mapped'].to_numpy())
+    else:
+        cluster_labels = cluster_names(k)
+    bar_fig, pie_fig = plot_cluster_counts(np.asarray(summary['cluster_counts']), cluster_labels, k)
+    return summary, sample, bar_fig, pie_fig
+
+# Bar and pie charts of the number of transactions per cluster id
+def plot_cluster_counts(counts, cluster_labels, k):
+    # Colors for the plots (own figures, not pyplot's global one: jobs draw concurrently)
+    palette = ['#598C75', "#68A691", "#437C6F"] if k == 3 else sns.color_palette("crest", k)
 
     # Bar Graph of Transactions Count per Cluster
-    plt.figure(figsize=(10, 6))
-    sns.countplot(data=df, x='Cluster_KMeans_Mapped', hue='Cluster_KMeans_Mapped', palette=['#598C75', "#68A691", "#437C6F"])
-    
+    bar_fig, ax = charts.new_figure((10, 6))
+    ax.bar([str(cluster_id) for cluster_id in range(len(counts))], counts, color=palette[:len(counts)])
+
     # Add titles and labels for bar graph
-    plt.title('Transaction Count per Cluster', fontsize=16)
-    plt.xlabel('Cluster', fontsize=12)
-    plt.ylabel('Count of Transactions', fontsize=12)
-    
-    # Show bar chart
-    bar_fig = plt.gcf()
-    plt.close(bar_fig)  
-
-    # Pie Chart of Cluster Distribution with Descriptions in Labels
-    cluster_counts = df['Cluster_KMeans_Mapped'].value_counts()
-
-    # Descriptive labels for the clusters
-    cluster_labels = {
-        0: 'Cluster 0: Low Amount',
-        1: 'Cluster 1: Medium Amount',
-        2: 'Cluster 2: High Amount'
-    }
+    ax.set_title('Transaction Count per Cluster', fontsize=16)
+    ax.set_xlabel('Cluster', fontsize=12)
+    ax.set_ylabel('Count of Transactions', fontsize=12)
+
+    # Pie Chart of Cluster Distribution with Descriptions in Labels (empty clusters left out)
+    present = [cluster_id for cluster_id in range(len(counts)) if counts[cluster_id]]
 
     # Prepare the labels list with descriptions
-    labels = [cluster_labels.get(cluster_id, f'Cluster {cluster_id}') for cluster_id in cluster_counts.index]
+    labels = [cluster_labels.get(cluster_id, f'Cluster {cluster_id}') for cluster_id in present]
 
     # Plot the pie chart with the original style and tilt
-    plt.figure(figsize=(8, 8))
-    plt.pie(cluster_counts, labels=labels, autopct='%1.1f%%', colors=['#598C75', "#68A691", "#437C6F"], startangle=90)
+    pie_fig, ax = charts.new_figure((8, 8))
+    ax.pie([counts[cluster_id] for cluster_id in present], labels=labels, autopct='%1.1f%%',
+           colors=[palette[cluster_id] for cluster_id in present], startangle=90)
 
     # Add title in the center of pie chart
-    plt.title('Cluster Distribution in Transactions', fontsize=16, weight='bold', loc='center')
+    ax.set_title('Cluster Distribution in Transactions', fontsize=16, weight='bold', loc='center')
 
     # Ensure the title is at the center
-    plt.tight_layout()
-    
-    # Show pie chart
-    pie_fig = plt.gcf()
-    plt.close(pie_fig)  # To prevent it from blocking the execution
+    pie_fig.tight_layout()
 
-    return df, bar_fig, pie_fig
+    return bar_fig, pie_fig
@@ -0,0 +1,163 @@
+"""
+Out-of-Core Amount Clustering (transaction CSVs larger than memory)
+
+- Pass 1 reads only the Amount column in chunks and adds it to a weighted
+  histogram of cent-rounded amounts. Memory grows with the number of
+  distinct amounts, not rows. When there are more than MAX_BINS distinct
+  amounts, the bins are widened (2, 4, 8... cents).
+- Fits exact 1-D k-means (ckmeans) on the weighted histogram. This is the
+  same optimum as clustering every row when no widening was needed.
+- Pass 2 reads Transaction ID, Description and Amount in chunks (compact
+  dtypes), labels each chunk with a binary search against the cluster
+  thresholds and appends it straight to the output CSV (and optionally the
+  output store). Nothing is kept between chunks.
+- With a saved model (cluster_model.py) pass 1 is skipped and rows are
+  labelled with its thresholds; this is how the app clusters uploads.
+
+Usage:
+    python -m unsupervised.streaming_clustering transactions.csv -o clustered.csv --k 3
+"""
+
+import os
+import time
+import argparse
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from unsupervised import ckmeans
+from unsupervised.clustering import N_CLUSTERS
+
+CHUNK_ROWS = int(os.getenv("CLUSTER_CHUNK_ROWS", "1000000"))
+MAX_BINS = int(os.getenv("CLUSTER_MAX_BINS", "2000000"))
+OUTPUT_COLUMNS = ["Transaction ID", "Description", "Amount", "Cluster_KMeans_Mapped"]
+DTYPES = {"Description": "category", "Amount": "float64"}
+
+
+class AmountHistogram:
+    """Counts of cent-rounded amounts, widened when there are too many distinct amounts."""
+
+    def __init__(self, max_bins: int = MAX_BINS):
+        self.max_bins = max_bins
+        self.bin_cents = 1      # Width of one bin
+        self.keys = np.zeros(0, dtype=np.int64)      # Bin indexes, sorted
+        self.counts = np.zeros(0, dtype=np.int64)
+        self._pending: List[np.ndarray] = []
+        self._pending_size = 0
+
+    # Bin index of each amount at the current bin width (cents // bin_cents)
+    def bin(self, amounts: np.ndarray) -> np.ndarray:
+        cents = np.rint(np.asarray(amounts, dtype=np.float64) * 100).astype(np.int64)
+        return np.floor_divide(cents, self.bin_cents)
+
+    # Amount each bin stands for (its middle; the exact cent amount while bins are 1 cent wide)
+    def amount(self, keys: np.ndarray) -> np.ndarray:
+        return (keys * self.bin_cents + (self.bin_cents - 1) / 2) / 100
+
+    def add(self, amounts: np.ndarray):
+        keys, counts = np.unique(self.bin(amounts), return_counts=True)
+        self._pending.append(np.stack([keys, counts]))
+        self._pending_size += keys.size
+        if self._pending_size > self.max_bins:
+            self._merge()
+
+    # Fold the pending chunk counts into the histogram, widening bins until it fits
+    def _merge(self):
+        if self._pending:
+            stacked = np.concatenate([np.stack([self.keys, self.counts])] + self._pending, axis=1)
+            self._pending, self._pending_size = [], 0
+            self.keys, inverse = np.unique(stacked[0], return_inverse=True)
+            self.counts = np.bincount(inverse, weights=stacked[1], minlength=self.keys.size).astype(np.int64)
+        while self.keys.size > self.max_bins:
+            self.bin_cents *= 2
+            self.keys, inverse = np.unique(np.floor_divide(self.keys, 2), return_inverse=True)
+            self.counts = np.bincount(inverse, weights=self.counts, minlength=self.keys.size).astype(np.int64)
+
+    # (bin amounts, counts) ready for weighted clustering
+    def weighted_amounts(self):
+        self._merge()
+        return self.amount(self.keys), self.counts.astype(np.float64)
+
+
+# The CSV in chunks of `chunksize` rows, only the given columns
+def read_chunks(source, columns, chunksize: int = CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    if hasattr(source, "seek"):
+        source.seek(0)  # Uploads are read once per pass
+    return pd.read_csv(source, usecols=columns, dtype={c: DTYPES[c] for c in columns if c in DTYPES},
+                       chunksize=chunksize)
+
+# Histogram of every amount in the CSV (rows without a finite amount are left out)
+def amount_histogram(source, chunksize: int = CHUNK_ROWS) -> AmountHistogram:
+    histogram = AmountHistogram()
+    for chunk in read_chunks(source, ["Amount"], chunksize):
+        amounts = chunk["Amount"].to_numpy()
+        histogram.add(amounts[np.isfinite(amounts)])
+    return histogram
+
+# Pass 1: histogram of the amounts and the sorted cluster centers fitted on it
+def fit_centers(source, k: int = N_CLUSTERS, chunksize: int = CHUNK_ROWS):
+    histogram = amount_histogram(source, chunksize)
+    amounts, weights = histogram.weighted_amounts()
+    if not len(amounts):
+        raise ValueError("No rows with an amount to cluster")
+    _, centers = ckmeans.ckmeans(amounts, min(k, amounts.size), weights=weights)  # Bins are distinct
+    return histogram, centers
+
+# Cluster a transaction CSV without loading it: pass 1 fits on the amount histogram (skipped
+# when a saved model is given), pass 2 labels each chunk and appends it to output_path (and to
+# the output store if to_store). Rows without an amount are not written. Returns a summary of the run.
+def cluster_csv(source, output_path: str, k: int = N_CLUSTERS, chunksize: int = CHUNK_ROWS,
+                to_store: bool = False, model=None) -> Dict[str, Any]:
+    start = time.perf_counter()
+    if model is not None:
+        histogram, centers = None, model.centers
+    else:
+        histogram, centers = fit_centers(source, k, chunksize)
+    thresholds = ckmeans.thresholds(centers)
+    fit_seconds = time.perf_counter() - start
+
+    if to_store:
+        from storage import output_store
+    counts = np.zeros(len(centers), dtype=np.int64)
+    rows_skipped = 0
+    with open(output_path, "w", newline="", encoding="utf-8") as out:
+        for index, chunk in enumerate(read_chunks(source, OUTPUT_COLUMNS[:3], chunksize)):
+            missing = chunk["Amount"].isna()
+            if missing.any():
+                rows_skipped += int(missing.sum())
+                chunk = chunk[~missing]
+            amounts = chunk["Amount"].to_numpy()
+            if histogram is not None:
+                # Label the binned amount so every row lands where its bin did in pass 1
+                amounts = histogram.amount(histogram.bin(amounts))
+            labels = np.searchsorted(thresholds, amounts)
+            chunk = chunk.assign(Cluster_KMeans_Mapped=labels)[OUTPUT_COLUMNS]
+            chunk.to_csv(out, header=index == 0, index=False)
+            if to_store:
+                output_store.append("clustered_transactions", chunk.astype({"Description": "string"}))
+            counts += np.bincount(labels, minlength=len(centers))
+
+    fit = ({"model_version": model.version} if histogram is None else
+           {"distinct_amounts": int(histogram.keys.size), "bin_cents": histogram.bin_cents})
+    return {"rows": int(counts.sum()), "rows_skipped": rows_skipped, **fit,
+            "centers": centers.round(2).tolist(), "thresholds": thresholds.round(2).tolist(),
+            "cluster_counts": counts.tolist(), "fit_seconds": round(fit_seconds, 2),
+            "seconds": round(time.perf_counter() - start, 2)}
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="Transaction CSV with Transaction ID, Description and Amount columns")
+    parser.add_argument("-o", "--output", required=True, help="Clustered CSV to write")
+    parser.add_argument("--k", type=int, default=N_CLUSTERS, help="Number of amount clusters")
+    parser.add_argument("--chunksize", type=int, default=CHUNK_ROWS, help="Rows per chunk")
+    parser.add_argument("--store", action="store_true", help="Also append the rows to the output store")
+    args = parser.parse_args(argv)
+
+    summary = cluster_csv(args.source, args.output, args.k, args.chunksize, args.store)
+    for key, value in summary.items():
+        print(f"{key:>18}: {value}")
+    print(f"{summary['rows'] / summary['seconds']:>18,.0f} rows/s")
+
+if __name__ == "__main__":
+    main()